@@ -0,0 +1,294 @@
+#!/usr/bin/env python3
+"""
+Analytics Engine: precomputed arrays behind the dashboard's condition, lab and trend charts
+"""
+
+import numpy as np
+import pandas as pd
+
+
+class ConditionMatrix:
+    """Patient-by-condition indicator matrix for the condition impact chart
+
+    Mean LOS, patient counts and comorbidity overlap for any cohort come from
+    one pass over the cohort's rows: the indicator matrix times the LOS
+    vector, its column sums, and its Gram matrix.
+    """
+
+    def __init__(self, df, disease_cols):
+        self.data_version = df.attrs.get('data_version')
+        self.conditions = list(disease_cols)
+        self.indicators = (df[self.conditions].to_numpy() == 1).astype(np.int8)
+        self.los = df['lengthofstay'].to_numpy(dtype=np.float64)
+
+    def impact(self, rows=None):
+        """Per-condition count, LOS sum and co-occurrence counts for a cohort"""
+        if rows is None:
+            rows = slice(None)
+        indicators = self.indicators[rows].astype(np.float64)
+        los = self.los[rows]
+        return {
+            'conditions': self.conditions,
+            'count': indicators.sum(axis=0).astype(np.int64),
+            'los_sum': indicators.T @ los,
+            'cooccurrence': (indicators.T @ indicators).astype(np.int64)
+        }
+
+
+LAB_METRICS = ['creatinine', 'glucose', 'hematocrit', 'neutrophils', 'sodium', 'bloodureanitro']
+
+
+class LabHistograms:
+    """Fixed-edge bins per lab metric for the lab bubble chart
+
+    For each lab the sorted values give the 5th/95th percentile clip range;
+    8-12 equal-width bins are laid over it and every row gets its bin code
+    once per data version. A cohort's bubble statistics are then bincounts
+    of its rows' codes weighted by lab value, LOS and readmission flag.
+    """
+
+    def __init__(self, df, labs=LAB_METRICS):
+        self.data_version = df.attrs.get('data_version')
+        self.labs = list(labs)
+        self.los = df['lengthofstay'].to_numpy(dtype=np.float64)
+        self.readmit = df['readmit_flag'].to_numpy(dtype=np.float64)
+        self.values = {}
+        self.sorted_values = {}
+        self.edges = {}
+        self.codes = {}
+
+        for lab in self.labs:
+            values = df[lab].to_numpy(dtype=np.float64)
+            self.values[lab] = values
+            self.sorted_values[lab] = np.sort(values[~np.isnan(values)])
+            self.edges[lab], self.codes[lab] = self._bin(lab, values)
+
+    def quantile(self, lab, q):
+        """Linear-interpolation quantile from the presorted values"""
+        return float(np.quantile(self.sorted_values[lab], q))
+
+    def _bin(self, lab, values):
+        sorted_values = self.sorted_values[lab]
+        if len(sorted_values) == 0:
+            return np.array([0.0, 1.0]), np.full(len(values), -1, dtype=np.int8)
+
+        # Remove outliers for better visualization, then equal-width bins
+        lo, hi = self.quantile(lab, 0.05), self.quantile(lab, 0.95)
+        clipped = sorted_values[(sorted_values >= lo) & (sorted_values <= hi)]
+        spread = clipped.std(ddof=1) * 0.5 if len(clipped) > 1 else 0
+        n_bins = min(12, max(8, int((hi - lo) / spread))) if spread else 8
+        edges = np.linspace(lo, hi, n_bins + 1)
+
+        # Right-closed bins with the lowest edge included, as pd.cut does
+        codes = np.searchsorted(edges, values, side='left') - 1
+        codes[values == lo] = 0
+        codes[(values < lo) | (values > hi) | np.isnan(values)] = -1
+        return edges, codes.astype(np.int8)
+
+    def cohort_stats(self, rows=None):
+        """Per-bin count and sums of lab value, LOS and readmissions for every lab"""
+        if rows is None:
+            rows = slice(None)
+        los = self.los[rows]
+        readmit = self.readmit[rows]
+        stats = {}
+        for lab in self.labs:
+            codes = self.codes[lab][rows]
+            valid = codes >= 0
+            binned = codes[valid]
+            n_bins = len(self.edges[lab]) - 1
+            stats[lab] = {
+                'edges': self.edges[lab],
+                'count': np.bincount(binned, minlength=n_bins),
+                'lab_sum': np.bincount(binned, weights=self.values[lab][rows][valid], minlength=n_bins),
+                'los_sum': np.bincount(binned, weights=los[valid], minlength=n_bins),
+                'readmit_sum': np.bincount(binned, weights=readmit[valid], minlength=n_bins)
+            }
+        return stats
+
+
+class TrendEngine:
+    """Daily admission counts and LOS sums indexed by day since the first admission
+
+    A cohort's daily arrays are two bincounts over its rows. Daily, weekly and
+    monthly points and trailing rolling means are all differences of prefix
+    sums of those arrays, so every point costs O(1) whatever the span.
+    """
+
+    RESOLUTIONS = ['Monthly', 'Weekly', 'Daily', 'Rolling 7-day', 'Rolling 28-day']
+    WINDOWS = {'Rolling 7-day': 7, 'Rolling 28-day': 28}
+
+    def __init__(self, df):
+        self.data_version = df.attrs.get('data_version')
+        days = df['vdate'].to_numpy(dtype='datetime64[D]')
+        dated = ~np.isnat(days)
+        if dated.any():
+            self.first_day = days[dated].min()
+            self.n_days = int((days[dated].max() - self.first_day).astype(np.int64)) + 1
+        else:
+            self.first_day = np.datetime64('1970-01-01', 'D')
+            self.n_days = 0
+
+        self.day_codes = np.full(len(days), -1, dtype=np.int32)
+        self.day_codes[dated] = (days[dated] - self.first_day).astype(np.int32)
+        self.los = df['lengthofstay'].to_numpy(dtype=np.float64)
+        self.dates = pd.DatetimeIndex(self.first_day + np.arange(self.n_days))
+
+    def daily(self, rows=None):
+        """Per-day admission counts and LOS sums for a cohort"""
+        if rows is None:
+            rows = slice(None)
+        codes = self.day_codes[rows]
+        dated = codes >= 0
+        return {
+            'counts': np.bincount(codes[dated], minlength=self.n_days).astype(np.float64),
+            'los_sums': np.bincount(codes[dated], weights=self.los[rows][dated], minlength=self.n_days)
+        }
+
+    def series(self, daily, resolution='Monthly'):
+        """Trend points as period, mean LOS ('lengthofstay') and admissions ('eid')"""
+        counts = daily['counts']
+        admitted = np.flatnonzero(counts)
+        if len(admitted) == 0:
+            return pd.DataFrame({'period': [], 'lengthofstay': [], 'eid': []})
+
+        # Only the span the cohort actually covers
+        lo, hi = admitted[0], admitted[-1] + 1
+        count_prefix = np.concatenate([[0.0], np.cumsum(counts)])
+        los_prefix = np.concatenate([[0.0], np.cumsum(daily['los_sums'])])
+        dates = self.dates[lo:hi]
+
+        if resolution in self.WINDOWS:
+            ends = np.arange(lo, hi) + 1
+            starts = np.maximum(ends - self.WINDOWS[resolution], 0)
+            labels = dates
+        else:
+            if resolution == 'Weekly':
+                is_start = dates.dayofweek == 0
+            elif resolution == 'Monthly':
+                is_start = dates.day == 1
+            else:
+                is_start = np.ones(len(dates), dtype=bool)
+            is_start[0] = True
+            starts = lo + np.flatnonzero(is_start)
+            ends = np.append(starts[1:], hi)
+
+            if resolution == 'Weekly':
+                labels = self.dates[starts].to_period('W-SUN').start_time
+            elif resolution == 'Monthly':
+                labels = self.dates[starts].strftime('%Y-%m')
+            else:
+                labels = self.dates[starts]
+
+        admissions = count_prefix[ends] - count_prefix[starts]
+        los_total = los_prefix[ends] - los_prefix[starts]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_los = np.where(admissions > 0, los_total / admissions, np.nan)
+
+        return pd.DataFrame({
+            'period': labels,
+            'lengthofstay': mean_los,
+            'eid': admissions.astype(np.int64)
+        })
+
+
+class BedCensus:
+    """Beds occupied per department per day, from an admission/discharge sweep line
+
+    Each stay is a +1 event on its admission day and a -1 event on its
+    discharge day. Events are bucketed into a day-by-department grid, and
+    the census is the running sum of that grid down the days. Folding in
+    new admissions only re-runs the sum from their earliest admission day.
+    """
+
+    def __init__(self, df=None):
+        self.first_day = None
+        self.facilities = []
+        self.deltas = np.zeros((0, 0), dtype=np.int32)
+        self.census = np.zeros((0, 0), dtype=np.int32)
+        if df is not None:
+            self.update(df)
+
+    @staticmethod
+    def _stays(chunk):
+        """Admission day, discharge day and department of each dated stay"""
+        admit = pd.to_datetime(chunk['vdate']).to_numpy(dtype='datetime64[D]')
+        discharge = pd.to_datetime(chunk['discharged']).to_numpy(dtype='datetime64[D]')
+        # Some discharge dates wrap to the start of the year; fall back to the LOS
+        by_los = admit + chunk['lengthofstay'].to_numpy(dtype=np.int64).astype('timedelta64[D]')
+        bad = np.isnat(discharge) | (discharge <= admit)
+        discharge = np.where(bad, by_los, discharge)
+        dated = ~np.isnat(admit)
+        return admit[dated], discharge[dated], chunk['facid'].astype(str).to_numpy()[dated]
+
+    def _resize(self, first_day, n_days, facilities):
+        """Re-lay the grids over a wider day range or more departments"""
+        shift = 0 if self.first_day is None else int((self.first_day - first_day).astype(np.int64))
+        end = shift + len(self.census)
+        columns = [facilities.index(f) for f in self.facilities]
+        for name in ('deltas', 'census'):
+            grid = np.zeros((n_days, len(facilities)), dtype=np.int32)
+            grid[shift:end, columns] = getattr(self, name)
+            setattr(self, name, grid)
+        # Days before the old range stay empty; days after it carry the old final census
+        if 0 < end < n_days:
+            self.census[end:] = self.census[end - 1]
+        self.first_day = first_day
+        self.facilities = facilities
+
+    def update(self, chunk):
+        """Fold a chunk of admissions into the census"""
+        admit, discharge, facid = self._stays(chunk)
+        if len(admit) == 0:
+            return
+
+        first_day = admit.min() if self.first_day is None else min(self.first_day, admit.min())
+        last_day = discharge.max() if self.first_day is None else max(
+            self.first_day + len(self.census) - 1, discharge.max())
+        facilities = sorted(set(self.facilities) | set(facid))
+        n_days = int((last_day - first_day).astype(np.int64)) + 1
+        if first_day != self.first_day or n_days != len(self.census) or facilities != self.facilities:
+            self._resize(first_day, n_days, facilities)
+
+        n_fac = len(facilities)
+        fac_codes = np.searchsorted(facilities, facid)
+        admit_codes = (admit - first_day).astype(np.int64)
+        discharge_codes = (discharge - first_day).astype(np.int64)
+        keys = np.concatenate([admit_codes * n_fac + fac_codes, discharge_codes * n_fac + fac_codes])
+        weights = np.concatenate([np.ones(len(admit)), -np.ones(len(admit))])
+        self.deltas += np.bincount(keys, weights=weights, minlength=n_days * n_fac).reshape(
+            n_days, n_fac).astype(np.int32)
+
+        # Census before the earliest new admission is unchanged
+        start = int(admit_codes.min())
+        base = self.census[start - 1] if start > 0 else 0
+        self.census[start:] = base + np.cumsum(self.deltas[start:], axis=0)
+
+    def daily(self, facilities=None, start_date=None, end_date=None):
+        """Daily census as one column per department, indexed by date"""
+        dates = pd.DatetimeIndex(self.first_day + np.arange(len(self.census))) if len(self.census) else pd.DatetimeIndex([])
+        frame = pd.DataFrame(self.census, index=dates, columns=self.facilities)
+        if facilities is not None:
+            frame = frame[[f for f in self.facilities if f in set(facilities)]]
+        if start_date is not None:
+            frame = frame[frame.index >= pd.Timestamp(start_date)]
+        if end_date is not None:
+            frame = frame[frame.index <= pd.Timestamp(end_date)]
+        return frame.rename_axis('date')
+
+    def to_dict(self):
+        return {
+            'first_day': None if self.first_day is None else str(self.first_day),
+            'facilities': self.facilities,
+            'deltas': self.deltas.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        census = cls()
+        if data['first_day'] is not None:
+            census.first_day = np.datetime64(data['first_day'], 'D')
+            census.facilities = list(data['facilities'])
+            census.deltas = np.array(data['deltas'], dtype=np.int32).reshape(-1, len(census.facilities))
+            census.census = np.cumsum(census.deltas, axis=0, dtype=np.int32)
+        return census
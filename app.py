@@ -49,6 +49,13 @@ IS_LOCAL_ENV = (
 SHOW_VOICE_FEATURES = True
 import json
 
+from data_pipeline import load_admissions, load_stream_summary, DATA_PATH, DISEASE_COLS
+from cohort_index import DateIndex, BitmapIndex, AdmissionCube, CohortCache, PatientIndex, SortIndex, cohort_key
+from clinical_rules import PRIORITY_RULES, RISK_FACTORS, EMERGENCY_INDICATORS, DISCHARGE_FACTORS, decode, worklist, worklist_size, issue_summary
+from summary_jobs import SummaryJobs, SummaryFailed
+from search_index import TrigramIndex, FuzzyNameIndex
+from analytics_engine import ConditionMatrix, LabHistograms, TrendEngine, BedCensus, LAB_METRICS
+
 # Import RAG system
 try:
     from rag_system import RAGSystem
@@ -67,6 +74,17 @@ except Exception as e:
     rag_system = None
     print(f"RAG system error: {e}")
 
+# How often the patient page checks whether its clinical summary has arrived
+SUMMARY_POLL_SECONDS = 1
+
+# Patients listed for a similar-spelling name search
+FUZZY_MATCH_LIMIT = 25
+
+# Store written by scripts/stream_ingest.py; above IN_MEMORY_MAX_ROWS admissions
+# (or without the CSV) the dashboard is served from its aggregates.json alone
+STREAM_STORE_DIR = "data/stream"
+IN_MEMORY_MAX_ROWS = 2_000_000
+
 # Load environment variables
 load_dotenv()
 
@@ -517,41 +535,141 @@ st.markdown("""
 @st.cache_data
 def load_data():
     """Load and preprocess data"""
-    df = pd.read_csv("data/LengthOfStay.csv")
-    
-    # Convert dates
-    df['vdate'] = pd.to_datetime(df['vdate'])
-    df['discharged'] = pd.to_datetime(df['discharged'])
-    df['Date_of_Birth'] = pd.to_datetime(df['Date_of_Birth'])
-    
-    # Create derived features
-    df['month'] = df['vdate'].dt.to_period('M').astype(str)
-    df['is_long_stay'] = (df['lengthofstay'] > df['lengthofstay'].quantile(0.75)).astype(int)
-    df['readmit_flag'] = (df['rcount'] != '0').astype(int)
-    
-    # Calculate age at admission
-    df['age_at_admission'] = (df['vdate'] - df['Date_of_Birth']).dt.days / 365.25
-    df['age_group'] = pd.cut(df['age_at_admission'], 
-                            bins=[0, 18, 35, 50, 65, 80, 100], 
-                            labels=['0-18', '19-35', '36-50', '51-65', '66-80', '80+'])
-    
-    # Create full name for patient identification
-    df['full_name'] = df['First_Name'] + ' ' + df['Last_Name']
-    
-    # Create risk level categorization
-    df['risk_level'] = 'Standard Risk'
-    high_risk_mask = (
-        (df['lengthofstay'] > df['lengthofstay'].quantile(0.9)) |
-        (df['readmit_flag'] == 1)
+    # Preprocessed frame comes from a columnar snapshot when the CSV is unchanged
+    df = load_admissions(DATA_PATH)
+    
+    return df, DISEASE_COLS
+
+@st.cache_resource
+def get_stream_summary(store_dir, mtime):
+    """Aggregates and census of the streamed store, reloaded when aggregates.json changes"""
+    return load_stream_summary(store_dir)
+
+def stream_summary_for_dashboard():
+    """The streamed store's summary when the dashboard should not load the full frame"""
+    path = os.path.join(STREAM_STORE_DIR, 'aggregates.json')
+    if not os.path.exists(path):
+        return None
+    summary = get_stream_summary(STREAM_STORE_DIR, os.path.getmtime(path))
+    if summary is None:
+        return None
+    if summary['rows'] > IN_MEMORY_MAX_ROWS or not os.path.exists(DATA_PATH):
+        return summary
+    return None
+
+@st.cache_resource
+def get_date_index(data_version, _df):
+    """Sorted vdate index of the admissions frame, built once per data version"""
+    return DateIndex(_df)
+
+@st.cache_resource
+def get_bitmap_index(data_version, _df):
+    """Per-value bitsets of the sidebar filter columns, built once per data version"""
+    return BitmapIndex(_df)
+
+@st.cache_resource
+def get_admission_cube(data_version, _df):
+    """Pre-aggregated KPI/department cube, built once per data version"""
+    return AdmissionCube(_df)
+
+@st.cache_resource
+def get_condition_matrix(data_version, _df, disease_cols):
+    """Patient-by-condition indicator matrix, built once per data version"""
+    return ConditionMatrix(_df, disease_cols)
+
+@st.cache_resource
+def get_lab_histograms(data_version, _df):
+    """Fixed-edge lab bins for the bubble chart, built once per data version"""
+    return LabHistograms(_df)
+
+@st.cache_resource
+def get_trend_engine(data_version, _df):
+    """Day-indexed admission arrays for the trend chart, built once per data version"""
+    return TrendEngine(_df)
+
+@st.cache_resource
+def get_bed_census(data_version, _df):
+    """Daily bed census per department, built once per data version"""
+    return BedCensus(_df)
+
+@st.cache_resource
+def get_patient_index(data_version, _df):
+    """eid and patient-identity lookups for the detail page, built once per data version"""
+    return PatientIndex(_df)
+
+@st.cache_resource
+def get_sort_index(data_version, _df):
+    """Presorted permutations for the patient table, built once per data version"""
+    return SortIndex(_df)
+
+@st.cache_resource
+def get_search_index(data_version, _df):
+    """Trigram index over patient names and departments, built once per data version"""
+    return TrigramIndex(_df)
+
+def search_patients(full_df, df, query, state_key):
+    """Mask of rows of df (a slice of full_df) whose name or department contains the query
+
+    The last result is kept in session state under state_key, so typing more
+    characters narrows it instead of searching from scratch.
+    """
+    search_index = get_search_index(full_df.attrs.get('data_version'), full_df)
+    previous = st.session_state.get(state_key)
+    if previous is not None and previous.get('data_version') != search_index.data_version:
+        previous = None
+    result = search_index.search(query, previous)
+    result['data_version'] = search_index.data_version
+    st.session_state[state_key] = result
+    return search_index.mask(result, df)
+
+@st.cache_resource
+def get_fuzzy_index(data_version, _df):
+    """Trigram-filtered fuzzy index over first and last names, built once per data version"""
+    return FuzzyNameIndex(_df)
+
+def fuzzy_patient_matches(full_df, df, query, limit=FUZZY_MATCH_LIMIT):
+    """Patients in df (a slice of full_df) whose name is within a few typos of the query
+
+    One row per patient (name plus date of birth), closest first: their
+    latest admission in df, with the number of typos and their admission count.
+    """
+    data_version = full_df.attrs.get('data_version')
+    fuzzy_index = get_fuzzy_index(data_version, full_df)
+    patient_index = get_patient_index(data_version, full_df)
+    
+    distance = fuzzy_index.distances(fuzzy_index.search(query), df)
+    hits = df[distance >= 0]
+    # df is a slice of the full frame, so its index labels are full-frame positions
+    identity = patient_index.row_identity[hits.index.to_numpy()]
+    ranked = pd.DataFrame({
+        'typos': distance[distance >= 0],
+        'name': hits['full_name'].astype(str).to_numpy(),
+        'vdate': hits['vdate'].to_numpy(),
+        'identity': identity
+    }, index=hits.index).sort_values(['typos', 'name', 'vdate'], ascending=[True, True, False], kind='stable')
+    # Same name and birth date is one patient (a missing birth date counts as one value)
+    ranked = ranked[~ranked['identity'].duplicated()].head(limit)
+    
+    matches = full_df.loc[ranked.index]
+    matches = matches.assign(
+        typos=ranked['typos'].to_numpy(),
+        admissions=np.diff(patient_index.offsets)[ranked['identity'].to_numpy()]
     )
-    df.loc[high_risk_mask, 'risk_level'] = 'High Risk'
-    
-    # Disease columns for analysis
-    disease_cols = ['dialysisrenalendstage', 'asthma', 'irondef', 'pneum', 
-                   'substancedependence', 'psychologicaldisordermajor', 
-                   'depress', 'psychother', 'fibrosisandother', 'malnutrition']
-    
-    return df, disease_cols
+    return matches
+
+@st.cache_resource
+def get_summary_jobs():
+    """Background workers for patient clinical summaries, shared by every session"""
+    return SummaryJobs(rag_system)
+
+@st.cache_resource
+def get_cohort_cache():
+    """LRU of filtered cohorts and chart aggregates, shared by every session"""
+    return CohortCache(max_entries=64)
+
+def cohort_aggregate(cohort, name, compute):
+    """Chart aggregate of the current cohort, memoized with it in the cohort cache"""
+    return get_cohort_cache().aggregate(cohort, name, compute)
 
 def create_chart_template():
     """Create a consistent chart template with Nordic styling"""
@@ -927,9 +1045,128 @@ def speak_text_web(text, unique_id):
     """
     return html_code
 
+def show_clinical_summary(summary_key, specific_conditions, patient_data, api_key):
+    """Clinical summary from the background worker, polled until it arrives"""
+    summary_jobs = get_summary_jobs()
+    polling = summary_jobs.status(summary_key) == 'running'
+
+    @st.fragment(run_every=SUMMARY_POLL_SECONDS if polling else None)
+    def summary_panel():
+        status = summary_jobs.status(summary_key)
+        if status == 'running':
+            st.info("⏳ Generating clinical summary from the literature...")
+            return
+        if polling:
+            # Arrived: rerun the page once so this panel stops polling; that
+            # rerun must not submit the job again if it failed
+            st.session_state['summary_poll_rerun'] = summary_key
+            st.rerun()
+        if status == 'failed':
+            error = summary_jobs.error(summary_key)
+            if isinstance(error, SummaryFailed) and error.response:
+                # API key, quota or rate-limit message
+                st.warning(error.response)
+            else:
+                st.warning("Clinical insights temporarily unavailable.")
+            retry_at = summary_jobs.retry_at(summary_key)
+            if retry_at:
+                st.caption(f"Retried automatically after {datetime.fromtimestamp(retry_at).strftime('%H:%M:%S')}")
+            if st.button("🔄 Retry", key=f"summary_retry_{summary_key[1]}"):
+                summary_jobs.submit(summary_key, patient_data, api_key=api_key, retry=True)
+                st.rerun()
+            return
+        if status != 'done':
+            st.warning("Clinical insights temporarily unavailable.")
+            return
+
+        try:
+            rag_response, relevant_papers, diagnostic_details = summary_jobs.result(summary_key)
+            
+            if rag_response and relevant_papers:
+                # Display detected conditions with diagnostic reasoning
+                condition_list = ", ".join(specific_conditions).title()
+                st.markdown(f"**Detected Conditions:** {condition_list}")
+
+                # Display diagnostic basis
+                if diagnostic_details:
+                    st.markdown("**Diagnostic Basis:**")
+                    for detail in diagnostic_details:
+                        st.markdown(f"• {detail}")
+
+                # Display clinical insights
+                st.markdown("**Clinical Analysis:**")
+                # Remove the reference section from RAG response for cleaner display
+                clean_response = rag_response.split("References:")[0].strip()
+                st.markdown(clean_response)
+
+                # Display relevant papers separately (remove duplicates)
+                if relevant_papers:
+                    st.markdown("**Supporting Evidence:**")
+                    unique_filenames = []
+                    for paper in relevant_papers[:3]:
+                        filename = paper.get('filename', '')
+                        if filename not in unique_filenames:
+                            unique_filenames.append(filename)
+
+                            # Get paper metadata from database
+                            title = paper.get('title', filename.replace('.pdf', '').replace('.txt', ''))
+                            author = paper.get('authors', 'Unknown')
+                            year = paper.get('year', 'Unknown')
+
+                            # Format citation: Filename (Author, Year)
+                            # Clean filename for display - 不截断文件名
+                            display_filename = filename.replace('.pdf', '').replace('.txt', '')
+
+                            # 构建完整引用：文件名 (作者, 年份)
+                            citation_parts = []
+
+                            # 处理作者信息 - 更宽松的条件
+                            if author and author != 'Unknown' and author.strip() and author != 'affiliations':
+                                citation_parts.append(author.strip())
+
+                            # 处理年份信息 - 更宽松的条件
+                            if year and year is not None and str(year) != 'Unknown' and str(year) != 'nan' and str(year) != 'None':
+                                citation_parts.append(str(year))
+
+                            # 格式：文件名 (作者, 年份) 或 文件名 (年份) 或 文件名
+                            if citation_parts:
+                                citation = f"{display_filename} ({', '.join(citation_parts)})"
+                            else:
+                                citation = display_filename
+
+                            # 使用自动换行的HTML，超出宽度自动下一行
+                            st.markdown(f"""
+                            <div style="
+                                margin-bottom: 8px;
+                                word-wrap: break-word;
+                                word-break: break-word;
+                                white-space: normal;
+                                overflow-wrap: anywhere;
+                                line-height: 1.4;
+                            ">
+                                • {citation}
+                            </div>
+                            """, unsafe_allow_html=True)
+            else:
+                st.info("Ask questions in the chat to get evidence-based insights for this patient.")
+
+        except Exception as e:
+            st.warning("Clinical insights temporarily unavailable.")
+
+    summary_panel()
+
 def show_patient_detail(patient_id, df):
     """Show detailed patient information with sidebar showing patient history"""
-    patient = df[df['eid'] == patient_id].iloc[0]
+    patient_index = get_patient_index(df.attrs.get('data_version'), df)
+    position = patient_index.position(patient_id)
+    if position is None:
+        st.error(f"Patient {patient_id} not found.")
+        if st.button("← Back to Dashboard"):
+            st.session_state.current_page = "dashboard"
+            st.session_state.selected_patient = None
+            st.rerun()
+        return
+    patient = df.iloc[position]
 
     # Sidebar with patient history
     with st.sidebar:
@@ -937,9 +1174,8 @@ def show_patient_detail(patient_id, df):
         st.markdown(f"**Patient:** {patient['full_name']}")
         st.markdown("---")
 
-        # Get all records for this patient (by name)
-        patient_name = patient['full_name']
-        patient_history = df[df['full_name'] == patient_name].sort_values('vdate')
+        # Get all records for this patient (same name and date of birth)
+        patient_history = df.iloc[patient_index.history(position)]
 
         if len(patient_history) > 1:
             st.markdown(f"**Total Admissions:** {len(patient_history)}")
@@ -1005,80 +1241,14 @@ def show_patient_detail(patient_id, df):
         
         if specific_conditions:
             with st.expander("Clinical Summary & Evidence-Based Insights", expanded=True):
-                # Get RAG analysis for this patient
-                try:
-                    rag_response, relevant_papers, diagnostic_details = rag_system.get_rag_response_for_patient(patient)
-                    
-                    if rag_response and relevant_papers:
-                        # Display detected conditions with diagnostic reasoning
-                        condition_list = ", ".join(specific_conditions).title()
-                        st.markdown(f"**Detected Conditions:** {condition_list}")
-                        
-                        # Display diagnostic basis
-                        if diagnostic_details:
-                            st.markdown("**Diagnostic Basis:**")
-                            for detail in diagnostic_details:
-                                st.markdown(f"• {detail}")
-                        
-                        # Display clinical insights
-                        st.markdown("**Clinical Analysis:**")
-                        # Remove the reference section from RAG response for cleaner display
-                        clean_response = rag_response.split("References:")[0].strip()
-                        st.markdown(clean_response)
-                        
-                        # Display relevant papers separately (remove duplicates)
-                        if relevant_papers:
-                            st.markdown("**Supporting Evidence:**")
-                            unique_filenames = []
-                            for paper in relevant_papers[:3]:
-                                filename = paper.get('filename', '')
-                                if filename not in unique_filenames:
-                                    unique_filenames.append(filename)
-
-                                    # Get paper metadata from database
-                                    title = paper.get('title', filename.replace('.pdf', '').replace('.txt', ''))
-                                    author = paper.get('authors', 'Unknown')
-                                    year = paper.get('year', 'Unknown')
-
-                                    # Format citation: Filename (Author, Year)
-                                    # Clean filename for display - 不截断文件名
-                                    display_filename = filename.replace('.pdf', '').replace('.txt', '')
-
-                                    # 构建完整引用：文件名 (作者, 年份)
-                                    citation_parts = []
-
-                                    # 处理作者信息 - 更宽松的条件
-                                    if author and author != 'Unknown' and author.strip() and author != 'affiliations':
-                                        citation_parts.append(author.strip())
-
-                                    # 处理年份信息 - 更宽松的条件
-                                    if year and year is not None and str(year) != 'Unknown' and str(year) != 'nan' and str(year) != 'None':
-                                        citation_parts.append(str(year))
-
-                                    # 格式：文件名 (作者, 年份) 或 文件名 (年份) 或 文件名
-                                    if citation_parts:
-                                        citation = f"{display_filename} ({', '.join(citation_parts)})"
-                                    else:
-                                        citation = display_filename
-
-                                    # 使用自动换行的HTML，超出宽度自动下一行
-                                    st.markdown(f"""
-                                    <div style="
-                                        margin-bottom: 8px;
-                                        word-wrap: break-word;
-                                        word-break: break-word;
-                                        white-space: normal;
-                                        overflow-wrap: anywhere;
-                                        line-height: 1.4;
-                                    ">
-                                        • {citation}
-                                    </div>
-                                    """, unsafe_allow_html=True)
-                    else:
-                        st.info("Ask questions in the chat to get evidence-based insights for this patient.")
-                        
-                except Exception as e:
-                    st.warning("Clinical insights temporarily unavailable.")
+                # Generated on a background worker so the rest of the chart renders immediately
+                api_key = st.session_state.get('openai_api_key') or os.getenv('OPENAI_API_KEY')
+                # A key entered after a failed attempt gets a new job
+                summary_key = (df.attrs.get('data_version'), int(patient['eid']), bool(api_key))
+                patient_data = patient.to_dict()
+                if st.session_state.pop('summary_poll_rerun', None) != summary_key:
+                    get_summary_jobs().submit(summary_key, patient_data, api_key=api_key)
+                show_clinical_summary(summary_key, specific_conditions, patient_data, api_key)
     
     # Health Status Overview (Full width, 4 metrics)
     st.markdown("### Health Status Overview")
@@ -1108,20 +1278,12 @@ def show_patient_detail(patient_id, df):
     st.markdown("### Risk Assessment")
     risk_factors = []
     
-    # Analyze key risk factors
-    if patient['lengthofstay'] > df['lengthofstay'].quantile(0.75):
-        risk_factors.append("Extended length of stay")
-    if patient['readmit_flag'] == 1:
-        risk_factors.append("Previous readmission")
-    if patient['age_at_admission'] > 65:
-        risk_factors.append("Advanced age")
-    if patient['creatinine'] > 1.2:
-        risk_factors.append("Elevated creatinine")
-    if patient['glucose'] > 140:
-        risk_factors.append("Elevated glucose")
-    if patient['hematocrit'] < 12 or patient['hematocrit'] > 16:
-        hematocrit_status = "High hematocrit" if patient['hematocrit'] > 16 else "Low hematocrit"
-        risk_factors.append(f"<span style='color: #D47A84;'>{hematocrit_status}</span>")
+    # Analyze key risk factors (evaluated for every patient at load time)
+    for factor in decode(patient['risk_mask'], RISK_FACTORS):
+        if factor['alert']:
+            risk_factors.append(f"<span style='color: #D47A84;'>{factor['label']}</span>")
+        else:
+            risk_factors.append(factor['label'])
     
     if risk_factors:
         for factor in risk_factors:
@@ -1330,101 +1492,17 @@ def show_patient_detail(patient_id, df):
             </div>
             """, unsafe_allow_html=True)
 
-    # Extract lab values for subsequent use in clinical decision support
-    hematocrit = patient['hematocrit']
-    creatinine = patient['creatinine']
-    glucose = patient['glucose']
-
     st.markdown("<br>", unsafe_allow_html=True)
 
     # Clinical Decision Support
     st.markdown("### 🎯 Priority Actions")
     
-    # Priority system: Critical -> High -> Medium -> Low
-    critical_actions = []
-    high_priority = []
-    medium_priority = []
-    low_priority = []
-    
-    # Critical (immediate action needed)
-    if glucose > 300:
-        critical_actions.append({
-            'issue': 'Severe Hyperglycemia',
-            'action': 'Immediate insulin protocol + hourly glucose monitoring',
-            'timeline': 'NOW'
-        })
-    if creatinine > 2.0:
-        critical_actions.append({
-            'issue': 'Severe Kidney Dysfunction', 
-            'action': 'Urgent nephrology consult + fluid balance review',
-            'timeline': 'Within 2 hours'
-        })
-    if patient['pulse'] > 120 or patient['pulse'] < 50:
-        critical_actions.append({
-            'issue': f"{'High' if patient['pulse'] > 120 else 'Low'} Heart Rate",
-            'action': 'ECG + cardiac monitoring + vitals q15min',
-            'timeline': 'NOW'
-        })
-    if hematocrit < 8:
-        critical_actions.append({
-            'issue': 'Severe Anemia',
-            'action': 'Type & cross + consider transfusion',
-            'timeline': 'Within 1 hour'
-        })
-    
-    # High Priority (same day)
-    if glucose > 180:
-        high_priority.append({
-            'issue': 'Hyperglycemia',
-            'action': 'Adjust insulin regimen + q6h glucose checks',
-            'timeline': 'Within 4 hours'
-        })
-    if creatinine > 1.5:
-        high_priority.append({
-            'issue': 'Kidney Function Decline',
-            'action': 'Review medications + increase monitoring',
-            'timeline': 'Today'
-        })
-    if patient['lengthofstay'] > 10:
-        high_priority.append({
-            'issue': 'Extended Stay Risk',
-            'action': 'Discharge planning meeting + complications review',
-            'timeline': 'Today'
-        })
-    
-    # Medium Priority (24-48 hours)
-    if hematocrit < 12:
-        medium_priority.append({
-            'issue': 'Anemia',
-            'action': 'Iron studies + nutrition consult',
-            'timeline': 'Within 24h'
-        })
-    if patient['bmi'] < 18.5:
-        medium_priority.append({
-            'issue': 'Underweight',
-            'action': 'Nutrition assessment + calorie count',
-            'timeline': 'Within 48h'
-        })
-    if any(patient[col] == 1 for col in ['depress', 'psychologicaldisordermajor']):
-        medium_priority.append({
-            'issue': 'Mental Health Needs',
-            'action': 'Psychology/psychiatry consult',
-            'timeline': 'Within 48h'
-        })
-    
-    # Low Priority (routine care)
-    if patient['bmi'] > 25:
-        low_priority.append({
-            'issue': 'Weight Management',
-            'action': 'Dietary counseling + activity plan',
-            'timeline': 'Before discharge'
-        })
-    if patient['readmit_flag'] == 1:
-        low_priority.append({
-            'issue': 'Readmission Risk',
-            'action': 'Enhanced discharge education + follow-up',
-            'timeline': 'Before discharge'
-        })
+    # Priority system: Critical -> High -> Medium -> Low, evaluated for
+    # every patient at load time (see clinical_rules.py)
+    critical_actions = decode(patient['priority_mask'], PRIORITY_RULES, 'critical')
+    high_priority = decode(patient['priority_mask'], PRIORITY_RULES, 'high')
+    medium_priority = decode(patient['priority_mask'], PRIORITY_RULES, 'medium')
+    low_priority = decode(patient['priority_mask'], PRIORITY_RULES, 'low')
     
     # Display priorities
     if critical_actions:
@@ -1467,66 +1545,10 @@ def show_patient_detail(patient_id, df):
     # Discharge Readiness Assessment
     st.markdown("### 🏠 Discharge Readiness")
     
-    # Calculate discharge readiness score
-    discharge_score = 0
-    blocking_factors = []
-    ready_factors = []
-    
-    # Medical stability (40% of score)
-    if not critical_actions and not high_priority:
-        discharge_score += 40
-        ready_factors.append("Medical condition stable")
-    else:
-        blocking_factors.append("Unresolved critical/high priority issues")
-    
-    # Lab values stability (30% of score)
-    stable_labs = 0
-    total_labs = 0
-    
-    if 70 <= glucose <= 180:
-        stable_labs += 1
-        ready_factors.append("Glucose controlled")
-    elif glucose > 180:
-        blocking_factors.append("Uncontrolled glucose")
-    total_labs += 1
-    
-    if 0.6 <= creatinine <= 1.5:
-        stable_labs += 1
-        ready_factors.append("Kidney function stable")
-    elif creatinine > 1.5:
-        blocking_factors.append("Kidney function concerns")
-    total_labs += 1
-    
-    if hematocrit >= 10:
-        stable_labs += 1
-        ready_factors.append("Adequate blood levels")
-    else:
-        blocking_factors.append("Severe anemia needs treatment")
-    total_labs += 1
-    
-    discharge_score += int(30 * stable_labs / total_labs)
-    
-    # Length of stay consideration (20% of score)
-    if patient['lengthofstay'] <= 7:
-        discharge_score += 20
-        ready_factors.append("Appropriate length of stay")
-    elif patient['lengthofstay'] > 14:
-        blocking_factors.append("Extended stay - investigate barriers")
-    else:
-        discharge_score += 10
-    
-    # Social factors (10% of score)
-    if patient['malnutrition'] == 0:
-        discharge_score += 5
-        ready_factors.append("Nutrition adequate")
-    else:
-        blocking_factors.append("Nutrition concerns need addressing")
-    
-    if not any(patient[col] == 1 for col in ['depress', 'psychologicaldisordermajor']):
-        discharge_score += 5
-        ready_factors.append("Mental health stable")
-    else:
-        blocking_factors.append("Mental health needs ongoing care")
+    # Discharge readiness score and factors, evaluated at load time
+    discharge_score = int(patient['discharge_score'])
+    ready_factors = [f['ready'] for f in decode(patient['discharge_ready_mask'], DISCHARGE_FACTORS)]
+    blocking_factors = [f['blocking'] for f in decode(patient['discharge_blocking_mask'], DISCHARGE_FACTORS)]
     
     # Display discharge readiness
     if discharge_score >= 80:
@@ -1609,17 +1631,10 @@ def show_patient_detail(patient_id, df):
         # Emergency Information
         st.markdown("### Emergency Information")
         
-        emergency_indicators = []
-        if creatinine > 2.0:
-            emergency_indicators.append("Severe kidney dysfunction")
-        if glucose > 300:
-            emergency_indicators.append("Severe hyperglycemia")
-        if patient['pulse'] > 120:
-            emergency_indicators.append("High heart rate")
-        elif patient['pulse'] < 50:
-            emergency_indicators.append("Low heart rate")
-        if hematocrit < 8:
-            emergency_indicators.append("Severe anemia")
+        emergency_indicators = [
+            indicator['label']
+            for indicator in decode(patient['emergency_mask'], EMERGENCY_INDICATORS)
+        ]
             
         if emergency_indicators:
             st.write("**Alert conditions:**")
@@ -2539,8 +2554,23 @@ def main():
     if "selected_patient" not in st.session_state:
         st.session_state.selected_patient = None
     
+    # Very large exports are summarized from the streamed store, never loaded
+    stream_summary = stream_summary_for_dashboard()
+    if stream_summary is not None:
+        show_stream_dashboard(stream_summary)
+        return
+    
     # Load data
     df, disease_cols = load_data()
+    date_index = get_date_index(df.attrs.get('data_version'), df)
+    bitmap_index = get_bitmap_index(df.attrs.get('data_version'), df)
+    admission_cube = get_admission_cube(df.attrs.get('data_version'), df)
+    condition_matrix = get_condition_matrix(df.attrs.get('data_version'), df, disease_cols)
+    lab_histograms = get_lab_histograms(df.attrs.get('data_version'), df)
+    trend_engine = get_trend_engine(df.attrs.get('data_version'), df)
+    bed_census = get_bed_census(df.attrs.get('data_version'), df)
+    # Built here rather than inside the first name search that needs it
+    get_fuzzy_index(df.attrs.get('data_version'), df)
     
     # Check if we should show patient detail page
     if st.session_state.current_page == "patient_detail" and st.session_state.selected_patient:
@@ -2548,12 +2578,7 @@ def main():
         return
     
     # Header
-    st.markdown("""
-    <div class="main-header">
-        <div class="main-title">Healthcare Analytics</div>
-        <div class="main-subtitle">Patient Care & Performance Insights</div>
-    </div>
-    """, unsafe_allow_html=True)
+    create_dashboard_header()
     
     # Sidebar filters (moved to sidebar with chat)
     with st.sidebar:
@@ -2581,31 +2606,37 @@ def main():
         # Date range filter
         date_range = st.date_input(
             "Date Range",
-            value=[df['vdate'].min().date(), df['vdate'].max().date()],
-            min_value=df['vdate'].min().date(),
-            max_value=df['vdate'].max().date()
+            value=[date_index.min_date(), date_index.max_date()],
+            min_value=date_index.min_date(),
+            max_value=date_index.max_date()
         )
         
+        # Facet counts are filled into these slots once all selections are known
+        facet_slots = {}
+        
         # Gender filter
         gender_options = st.multiselect(
             "Gender",
             options=['M', 'F'],
             default=['M', 'F']
         )
+        facet_slots['gender'] = st.empty()
         
         # Department filter
         dept_options = st.multiselect(
             "Department",
-            options=sorted(df['facid'].unique()),
-            default=sorted(df['facid'].unique())
+            options=bitmap_index.values['facid'],
+            default=bitmap_index.values['facid']
         )
+        facet_slots['facid'] = st.empty()
         
         # Age group filter
         age_options = st.multiselect(
             "Age Group",
-            options=sorted(df['age_group'].dropna().unique()),
-            default=sorted(df['age_group'].dropna().unique())
+            options=bitmap_index.values['age_group'],
+            default=bitmap_index.values['age_group']
         )
+        facet_slots['age_group'] = st.empty()
         
         # Risk level filter
         risk_options = st.multiselect(
@@ -2613,6 +2644,7 @@ def main():
             options=["Standard Risk", "High Risk"],
             default=["Standard Risk", "High Risk"]
         )
+        facet_slots['risk_level'] = st.empty()
     
     # Handle date range - ensure we have both start and end dates
     if isinstance(date_range, (list, tuple)) and len(date_range) == 2:
@@ -2622,35 +2654,54 @@ def main():
         start_date = end_date = date_range if not isinstance(date_range, (list, tuple)) else date_range[0]
     
     # Apply filters with error handling
+    cohort = None
     try:
-        mask = (
-            (df['vdate'].dt.date >= start_date) &
-            (df['vdate'].dt.date <= end_date)
+        # Date range is a binary search on the sorted vdate index, the
+        # categorical filters are ANDed bitsets
+        date_rows = date_index.rows_between(start_date, end_date)
+        selections = {
+            'gender': gender_options,
+            'facid': dept_options,
+            'age_group': age_options,
+            'risk_level': risk_options
+        }
+        
+        # Same filters + same data version -> same cohort, straight from the LRU
+        cohort_cache = get_cohort_cache()
+        cohort = cohort_cache.get(
+            cohort_key(df.attrs.get('data_version'), start_date, end_date, selections),
+            lambda: bitmap_index.positions(bitmap_index.match(selections, date_rows))
         )
+        filtered_df = df.iloc[cohort['rows']]
         
-        if gender_options:
-            mask = mask & (df['gender'].isin(gender_options))
-        if dept_options:
-            mask = mask & (df['facid'].isin(dept_options))
-        if age_options:
-            mask = mask & (df['age_group'].isin(age_options))
-        if risk_options:
-            mask = mask & (df['risk_level'].isin(risk_options))
-            
-        filtered_df = df[mask]
+        for dim, slot in facet_slots.items():
+            counts = cohort_aggregate(cohort, f"facets:{dim}",
+                                      lambda: bitmap_index.facet_counts(dim, selections, date_rows))
+            slot.caption(" · ".join(f"{value}: {count:,}" for value, count in counts.items()))
         
+        # KPI and department figures are sums of cube cells
+        summary = cohort_aggregate(cohort, 'cube_summary', lambda: admission_cube.query(
+            selections, start_date, end_date,
+            # Edge-month rows are a binary search within the cohort already computed
+            edge_rows=lambda lo, hi: date_index.cohort_rows_between(cohort['rows'], lo, hi)
+        ))
+
         if filtered_df.empty:
             st.warning("No data available with current filters. Please adjust your selection.")
             # Show charts with full dataset instead of returning
             filtered_df = df
+            cohort = None
+            summary = admission_cube.query({})
     except Exception as e:
         st.error(f"Filter error: {e}")
         # Use full dataset if filtering fails
         filtered_df = df
+        cohort = None
+        summary = admission_cube.query({})
     
     # KPI Section
     st.markdown('<div class="section-header">Key Performance Indicators</div>', unsafe_allow_html=True)
-    create_kpi_cards(filtered_df)
+    create_kpi_cards(summary['kpis'])
     
     # Charts section
     st.markdown('<div class="section-header">Analytics Dashboard</div>', unsafe_allow_html=True)
@@ -2659,30 +2710,118 @@ def main():
     col1, col2 = st.columns(2, gap="large")
     
     with col1:
-        create_dept_comparison(filtered_df)
+        create_dept_comparison(summary['dept_stats'])
+        st.markdown("<br>", unsafe_allow_html=True)
+        # Bins for every lab at once, so switching the metric is a lookup
+        lab_stats = cohort_aggregate(
+            cohort, 'lab_histograms',
+            lambda: lab_histograms.cohort_stats(cohort['rows'] if cohort else None)
+        )
+        create_lab_scatter(lab_stats)
         st.markdown("<br>", unsafe_allow_html=True)
-        create_lab_scatter(filtered_df)
+        # An empty Department selection means no filter, as in every other chart
+        create_census_chart(bed_census.daily(dept_options or None, start_date, end_date))
     
     with col2:
-        create_disease_heatmap(filtered_df, disease_cols)
+        condition_stats = cohort_aggregate(
+            cohort, 'condition_stats',
+            lambda: condition_matrix.impact(cohort['rows'] if cohort else None)
+        )
+        create_disease_heatmap(condition_stats)
         st.markdown("<br>", unsafe_allow_html=True)
-        create_trend_analysis(filtered_df)
+        trend_daily = cohort_aggregate(
+            cohort, 'trend_daily',
+            lambda: trend_engine.daily(cohort['rows'] if cohort else None)
+        )
+        create_trend_analysis(trend_engine, trend_daily)
     
     # Detailed analysis
     st.markdown('<div class="section-header">Patient Details</div>', unsafe_allow_html=True)
-    create_detail_table(filtered_df)
+    create_detail_table(filtered_df, df, cohort)
+
+    # Cohort cache counters, after every chart has looked up its aggregate
+    cache_stats = get_cohort_cache().stats()
+    st.sidebar.caption(
+        f"Cohort cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses · "
+        f"{cache_stats['entries']}/{cache_stats['max_entries']} cohorts "
+        f"({cache_stats['nbytes'] / 2 ** 20:.1f} MB) · "
+        f"charts {cache_stats['aggregate_hits']} hits / {cache_stats['aggregate_misses']} misses"
+    )
 
     # AI floating chat widget
     add_floating_chat()
 
-def create_kpi_cards(df):
+def create_dashboard_header():
+    st.markdown("""
+    <div class="main-header">
+        <div class="main-title">Healthcare Analytics</div>
+        <div class="main-subtitle">Patient Care & Performance Insights</div>
+    </div>
+    """, unsafe_allow_html=True)
+
+def show_stream_dashboard(summary):
+    """KPI, department, trend and census views from a streamed store's aggregates
+
+    The running totals are kept per month and per department separately, so
+    the date range narrows the KPIs and the trend, and the department
+    selection narrows the department and census charts.
+    """
+    aggregates = summary['aggregates']
+    months = sorted(aggregates.by_month.index)
+    departments = sorted(aggregates.by_facid.index)
+    
+    create_dashboard_header()
+    
+    with st.sidebar:
+        st.markdown("### 🔍 Filters")
+        if months:
+            first_month, last_month = st.select_slider(
+                "Months",
+                options=months,
+                value=(months[0], months[-1]),
+                key="stream_months"
+            )
+            selected_months = [m for m in months if first_month <= m <= last_month]
+        else:
+            selected_months = []
+        dept_options = st.multiselect(
+            "Department",
+            options=departments,
+            default=departments,
+            key="stream_departments"
+        )
+        st.caption(f"Summary of {summary['rows']:,} admissions from {summary['csv_path']} "
+                   f"(streamed store, patient-level views need the full frame)")
+    
+    st.markdown('<div class="section-header">Key Performance Indicators</div>', unsafe_allow_html=True)
+    create_kpi_cards(aggregates.kpis(selected_months))
+    
+    st.markdown('<div class="section-header">Analytics Dashboard</div>', unsafe_allow_html=True)
+    col1, col2 = st.columns(2, gap="large")
+    
+    with col1:
+        dept_stats = aggregates.dept_stats()
+        if dept_options:
+            dept_stats = dept_stats[dept_stats['facid'].isin(dept_options)]
+        create_dept_comparison(dept_stats)
+        st.caption("All months")
+    
+    with col2:
+        create_trend_chart(aggregates.monthly_stats(selected_months), 'Monthly')
+    
+    if summary['census'] is not None and selected_months:
+        start_date = pd.Period(selected_months[0], freq='M').start_time.date()
+        end_date = pd.Period(selected_months[-1], freq='M').end_time.date()
+        create_census_chart(summary['census'].daily(dept_options or None, start_date, end_date))
+
+def create_kpi_cards(kpis):
     """Create KPI cards with Nordic styling"""
     col1, col2, col3, col4 = st.columns(4, gap="medium")
     
-    avg_los = df['lengthofstay'].mean()
-    long_stay_rate = (df['lengthofstay'] > 7).mean() * 100
-    readmit_rate = df['readmit_flag'].mean() * 100
-    turnover = 365 / avg_los
+    avg_los = kpis['avg_los']
+    long_stay_rate = kpis['long_stay_rate']
+    readmit_rate = kpis['readmit_rate']
+    turnover = kpis['turnover']
     
     with col1:
         st.metric(
@@ -2690,6 +2829,9 @@ def create_kpi_cards(df):
             f"{avg_los:.1f} days",
             delta=None
         )
+        st.caption(
+            f"P50 {kpis['los_p50']:.0f} · P75 {kpis['los_p75']:.0f} · P90 {kpis['los_p90']:.0f} days"
+        )
     
     with col2:
         st.metric(
@@ -2712,9 +2854,8 @@ def create_kpi_cards(df):
             delta=None
         )
 
-def create_dept_comparison(df):
+def create_dept_comparison(dept_stats):
     """Create department comparison chart with Nordic styling"""
-    dept_stats = df.groupby('facid', observed=False)['lengthofstay'].agg(['mean', 'count']).reset_index()
     dept_stats = dept_stats[dept_stats['count'] >= 10]
     
     fig = px.bar(
@@ -2734,30 +2875,29 @@ def create_dept_comparison(df):
     
     st.plotly_chart(fig, use_container_width=True)
 
-def create_disease_heatmap(df, disease_cols):
+DISEASE_NAMES = {
+    'dialysisrenalendstage': 'Renal Disease',
+    'asthma': 'Asthma',
+    'irondef': 'Iron Deficiency',
+    'pneum': 'Pneumonia',
+    'substancedependence': 'Substance Abuse',
+    'psychologicaldisordermajor': 'Psychological Disorder',
+    'depress': 'Depression',
+    'psychother': 'Psychotherapy',
+    'fibrosisandother': 'Fibrosis',
+    'malnutrition': 'Malnutrition'
+}
+
+def create_disease_heatmap(condition_stats):
     """Create disease heatmap with Nordic styling"""
     disease_los = []
-    disease_names = {
-        'dialysisrenalendstage': 'Renal Disease',
-        'asthma': 'Asthma',
-        'irondef': 'Iron Deficiency',
-        'pneum': 'Pneumonia',
-        'substancedependence': 'Substance Abuse',
-        'psychologicaldisordermajor': 'Psychological Disorder',
-        'depress': 'Depression',
-        'psychother': 'Psychotherapy',
-        'fibrosisandother': 'Fibrosis',
-        'malnutrition': 'Malnutrition'
-    }
-    
-    for disease in disease_cols:
-        disease_df = df[df[disease] == 1]
-        if len(disease_df) >= 5:
-            avg_los = disease_df['lengthofstay'].mean()
+    for i, disease in enumerate(condition_stats['conditions']):
+        count = int(condition_stats['count'][i])
+        if count >= 5:
             disease_los.append({
-                'condition': disease_names.get(disease, disease),
-                'avg_los': avg_los,
-                'count': len(disease_df)
+                'condition': DISEASE_NAMES.get(disease, disease),
+                'avg_los': condition_stats['los_sum'][i] / count,
+                'count': count
             })
     
     if disease_los:
@@ -2779,54 +2919,47 @@ def create_disease_heatmap(df, disease_cols):
         fig.update_coloraxes(showscale=False)
         
         st.plotly_chart(fig, use_container_width=True)
+        
+        # Comorbidity overlap - patients with both conditions
+        with st.expander("Comorbidity Overlap"):
+            names = [DISEASE_NAMES.get(d, d) for d in condition_stats['conditions']]
+            overlap_fig = px.imshow(
+                condition_stats['cooccurrence'],
+                x=names,
+                y=names,
+                labels={'color': 'Patients'},
+                color_continuous_scale=['#F8FAFC', '#A8B8C2', '#2E5266'],
+                text_auto=True
+            )
+            overlap_fig.update_layout(create_chart_template()['layout'])
+            overlap_fig.update_layout(height=450, title="Patients with Both Conditions")
+            st.plotly_chart(overlap_fig, use_container_width=True)
     else:
         st.info("Insufficient condition data for visualization")
 
-def create_lab_scatter(df):
+def create_lab_scatter(lab_stats):
     """Create lab bubble chart for risk stratification with Nordic styling"""
     st.markdown("**Laboratory Indicators & Risk Stratification**")
     
     # Lab metric selection
     lab_metrics = st.selectbox(
         "Laboratory Metric",
-        ['creatinine', 'glucose', 'hematocrit', 'neutrophils', 'sodium', 'bloodureanitro'],
+        LAB_METRICS,
         key="lab_selector"
     )
     
-    # Clean and prepare data
-    clean_df = df.dropna(subset=[lab_metrics, 'lengthofstay']).copy()
-    
-    # Remove outliers for better visualization
-    q1 = clean_df[lab_metrics].quantile(0.05)
-    q99 = clean_df[lab_metrics].quantile(0.95)
-    clean_df = clean_df[(clean_df[lab_metrics] >= q1) & (clean_df[lab_metrics] <= q99)]
-    
-    # Create value-based bins instead of quantile-based bins
-    min_val = clean_df[lab_metrics].min()
-    max_val = clean_df[lab_metrics].max()
-    
-    # Create 8-12 equal-width bins based on value range
-    n_bins = min(12, max(8, int((max_val - min_val) / (clean_df[lab_metrics].std() * 0.5))))
-    lab_bins = pd.cut(clean_df[lab_metrics], bins=n_bins, include_lowest=True)
-    
-    # Group data for bubble chart
+    # Bubble statistics come from the cohort's precomputed bin counts
+    stats = lab_stats[lab_metrics]
+    edges = stats['edges']
     bubble_data = []
-    for lab_range, group in clean_df.groupby(lab_bins, observed=False):
-        if len(group) >= 10:  # Minimum sample size for reliability
-            avg_lab_value = group[lab_metrics].mean()
-            avg_los = group['lengthofstay'].mean()
-            readmit_rate = group['readmit_flag'].mean() * 100
-            patient_count = len(group)
-            
-            # Format the range for better display
-            range_str = f"{lab_range.left:.2f} - {lab_range.right:.2f}"
-            
+    for i, patient_count in enumerate(stats['count']):
+        if patient_count >= 10:  # Minimum sample size for reliability
             bubble_data.append({
-                'lab_value': avg_lab_value,
-                'avg_los': avg_los,
-                'readmit_rate': readmit_rate,
-                'patient_count': patient_count,
-                'lab_range': range_str
+                'lab_value': stats['lab_sum'][i] / patient_count,
+                'avg_los': stats['los_sum'][i] / patient_count,
+                'readmit_rate': stats['readmit_sum'][i] / patient_count * 100,
+                'patient_count': int(patient_count),
+                'lab_range': f"{edges[i]:.2f} - {edges[i + 1]:.2f}"
             })
     
     if not bubble_data:
@@ -2885,22 +3018,58 @@ def create_lab_scatter(df):
     st.plotly_chart(fig, use_container_width=True)
     
 
-def create_trend_analysis(df):
+def create_census_chart(census):
+    """Create daily bed census chart with Nordic styling"""
+    if census.empty or census.shape[1] == 0:
+        st.info("No bed census available for the selected departments and dates.")
+        return
+    
+    occupied = census.reset_index().melt(id_vars='date', var_name='facid', value_name='beds')
+    fig = px.area(
+        occupied,
+        x='date',
+        y='beds',
+        color='facid',
+        title="Daily Bed Census by Department",
+        labels={'date': 'Date', 'beds': 'Occupied Beds', 'facid': 'Department'},
+        color_discrete_sequence=['#2E5266', COLORS['secondary'], COLORS['accent'], '#6C7B7F', COLORS['success']]
+    )
+    
+    fig.update_layout(create_chart_template()['layout'])
+    fig.update_layout(height=400)
+    
+    st.plotly_chart(fig, use_container_width=True)
+    
+    total = census.sum(axis=1)
+    st.caption(
+        f"Peak census {int(total.max())} beds on {total.idxmax().strftime('%Y-%m-%d')} · "
+        f"average {total.mean():.1f} beds per day"
+    )
+
+def create_trend_analysis(trend_engine, trend_daily):
     """Create trend analysis with Nordic styling"""
-    monthly_stats = df.groupby('month', observed=False).agg({
-        'lengthofstay': 'mean',
-        'eid': 'count'
-    }).reset_index()
+    
+    resolution = st.selectbox(
+        "Trend resolution",
+        TrendEngine.RESOLUTIONS,
+        key="trend_resolution"
+    )
+    create_trend_chart(trend_engine.series(trend_daily, resolution), resolution)
+
+def create_trend_chart(trend, resolution):
+    """Average LOS and volume per period (columns period, lengthofstay, eid)"""
+    period_label = {'Monthly': 'Month', 'Weekly': 'Week'}.get(resolution, 'Date')
+    mode = 'lines+markers' if len(trend) <= 60 else 'lines'
     
     fig = make_subplots(specs=[[{"secondary_y": True}]])
     
     fig.add_trace(
         go.Scatter(
-            x=monthly_stats['month'], 
-            y=monthly_stats['lengthofstay'],
+            x=trend['period'], 
+            y=trend['lengthofstay'],
             name="Avg Length of Stay",
             line=dict(color=COLORS['primary'], width=3),
-            mode='lines+markers',
+            mode=mode,
             marker=dict(size=6)
         ),
         secondary_y=False,
@@ -2908,11 +3077,11 @@ def create_trend_analysis(df):
     
     fig.add_trace(
         go.Scatter(
-            x=monthly_stats['month'], 
-            y=monthly_stats['eid'],
+            x=trend['period'], 
+            y=trend['eid'],
             name="Patient Volume",
             line=dict(color=COLORS['success'], width=3),
-            mode='lines+markers',
+            mode=mode,
             marker=dict(size=6)
         ),
         secondary_y=True,
@@ -2920,7 +3089,7 @@ def create_trend_analysis(df):
     
     fig.update_layout(create_chart_template()['layout'])
     fig.update_layout(
-        title="Monthly Trends Analysis",
+        title=f"{resolution} Trends Analysis",
         height=400,
         legend=dict(
             orientation="h",
@@ -2931,20 +3100,91 @@ def create_trend_analysis(df):
         )
     )
     
-    fig.update_xaxes(title_text="Month")
+    fig.update_xaxes(title_text=period_label)
     fig.update_yaxes(title_text="Average Length of Stay (days)", secondary_y=False)
     fig.update_yaxes(title_text="Patient Count", secondary_y=True)
     
     st.plotly_chart(fig, use_container_width=True)
 
-def create_detail_table(df):
-    """Create detailed patient table"""
+TABLE_SORT_COLUMNS = {
+    'Admission Date': 'vdate',
+    'Patient Name': 'full_name',
+    'Department': 'facid',
+    'Length of Stay': 'lengthofstay',
+    'Risk Level': 'risk_level'
+}
+
+def open_patient(patient_id):
+    """Switch to the patient detail page"""
+    st.session_state.current_page = "patient_detail"
+    st.session_state.selected_patient = patient_id
+    # New table keys next time, so a remembered row selection cannot reopen the patient
+    st.session_state.patient_table_nonce = st.session_state.get('patient_table_nonce', 0) + 1
+    st.rerun()
+
+def show_patient_table(full_df, rows, key, default_sort='Admission Date'):
+    """Paged patient grid: sorted and sliced on the server, one dataframe per page
+    
+    rows is a slice of full_df; its index labels are full-frame positions.
+    Only the visible page is formatted and sent to the browser. Selecting a
+    row opens that patient.
+    """
+    sort_col1, sort_col2, sort_col3, sort_col4 = st.columns([2, 1, 1, 1])
+    with sort_col1:
+        sort_label = st.selectbox("Sort by", list(TABLE_SORT_COLUMNS),
+                                  index=list(TABLE_SORT_COLUMNS).index(default_sort), key=f"{key}_sort")
+    with sort_col2:
+        descending = st.selectbox("Order", ["Descending", "Ascending"], key=f"{key}_order") == "Descending"
+    with sort_col3:
+        items_per_page = st.selectbox("Rows", [20, 50, 100], key=f"{key}_page_size")
+    
+    total_pages = max((len(rows) - 1) // items_per_page + 1, 1)
+    with sort_col4:
+        # A number input sends two bounds to the browser, not one option per page
+        current_page = st.number_input("Page", min_value=1, max_value=total_pages, step=1, key=f"{key}_page")
+    
+    # Ensure current_page is not None and still in range after the cohort shrinks
+    current_page = min(int(current_page or 1), total_pages)
+    
+    sort_index = get_sort_index(full_df.attrs.get('data_version'), full_df)
+    ordered = sort_index.order(TABLE_SORT_COLUMNS[sort_label], rows.index.to_numpy(), descending)
+    start_idx = (current_page - 1) * items_per_page
+    page = full_df.iloc[ordered[start_idx:start_idx + items_per_page]]
+    
+    # Format just this page
+    page_data = pd.DataFrame({
+        'Patient Name': page['full_name'].astype(str),
+        'Risk Level': np.where(page['risk_level'] == 'High Risk', '● High Risk', '○ Standard Risk'),
+        'Age Group': page['age_group'].astype(str),
+        'Admission Date': page['vdate'].dt.strftime('%Y-%m-%d'),
+        'Gender': page['gender'].astype(str),
+        'Department': page['facid'].astype(str),
+        'Length of Stay': page['lengthofstay'].astype(str) + ' days',
+        'Risk Count': page['rcount'].astype(str)
+    })
+    
+    event = st.dataframe(
+        page_data,
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="single-row",
+        key=f"{key}_grid_{st.session_state.get('patient_table_nonce', 0)}"
+    )
+    st.caption(f"Rows {start_idx + 1}-{start_idx + len(page)} of {len(rows)} · select a row to open the patient")
+    
+    selected = event.selection.rows if event is not None else []
+    if selected:
+        open_patient(page['eid'].iloc[selected[0]])
+
+def create_detail_table(df, full_df, cohort=None):
+    """Create detailed patient table (df is the filtered slice of full_df, cached as cohort)"""
     
     # Full patient list
     st.markdown("<br>", unsafe_allow_html=True)
     
     # Create tabs for better organization
-    tab1, tab2 = st.tabs(["Full Patient List", "Search & Filter"])
+    tab1, tab2, tab3 = st.tabs(["Full Patient List", "Search & Filter", "Clinical Worklist"])
     
     with tab1:
         if not df.empty:
@@ -2975,214 +3215,134 @@ def create_detail_table(df):
             
             st.markdown("---")
             
-            display_cols = ['full_name', 'risk_level', 'age_group', 'vdate', 'gender', 'facid', 'lengthofstay', 'rcount']
-            full_list = df[display_cols].copy()
-            full_list['vdate'] = full_list['vdate'].dt.strftime('%Y-%m-%d')
-            
             # Apply search filters
-            search_applied = False
+            full_list = df
             
             # Text search filter
             if quick_search:
-                search_mask = (
-                    df['full_name'].str.contains(quick_search, case=False, na=False) |
-                    df['facid'].str.contains(quick_search, case=False, na=False)
-                )
-                filtered_df_indices = df[search_mask].index
-                full_list = full_list.loc[filtered_df_indices]
-                search_applied = True
+                full_list = full_list[search_patients(full_df, full_list, quick_search, "quick_search_full_list_result")]
             
             # Gender filter
             if gender_filter != "All":
-                if search_applied:
-                    # Apply gender filter to already filtered data
-                    gender_mask = df.loc[full_list.index, 'gender'] == gender_filter
-                    full_list = full_list[gender_mask]
-                else:
-                    # Apply gender filter to all data
-                    gender_mask = df['gender'] == gender_filter
-                    filtered_df_indices = df[gender_mask].index
-                    full_list = full_list.loc[filtered_df_indices]
-                search_applied = True
-            
-            # Rename columns for better display
-            full_list = full_list.rename(columns={
-                'full_name': 'Patient Name',
-                'risk_level': 'Risk Level',
-                'age_group': 'Age Group', 
-                'vdate': 'Admission Date',
-                'gender': 'Gender',
-                'facid': 'Department',
-                'lengthofstay': 'Length of Stay',
-                'rcount': 'Risk Count'
-            })
-            
-            # Sort by admission date (most recent first)
-            full_list = full_list.sort_values('Admission Date', ascending=False)
+                full_list = full_list[full_list['gender'] == gender_filter]
             
             # Show different titles based on search
-            if search_applied:
+            if quick_search or gender_filter != "All":
                 search_terms = []
                 if quick_search:
                     search_terms.append(f"'{quick_search}'")
                 if gender_filter != "All":
                     search_terms.append(f"Gender: {gender_filter}")
                 
-                if search_terms:
-                    st.markdown(f"**Search Results** ({len(full_list)} patients matching {' & '.join(search_terms)})")
-                else:
-                    st.markdown(f"**Filtered Results** ({len(full_list)} patients)")
+                st.markdown(f"**Search Results** ({len(full_list)} patients matching {' & '.join(search_terms)})")
             else:
                 st.markdown(f"**All Patients** ({len(full_list)} patients)")
             
-            # Add pagination for better performance
-            items_per_page = 20
-            total_pages = (len(full_list) - 1) // items_per_page + 1
-            
-            col_page1, col_page2, col_page3 = st.columns([1, 2, 1])
-            with col_page2:
-                current_page = st.selectbox("Page", range(1, total_pages + 1), key="full_list_page")
-            
-            # Ensure current_page is not None
-            if current_page is None:
-                current_page = 1
-                
-            start_idx = (current_page - 1) * items_per_page
-            end_idx = start_idx + items_per_page
-            page_data = full_list.iloc[start_idx:end_idx]
-            
-            # Column headers
-            header_col1, header_col2, header_col3, header_col4, header_col5, header_col6, header_col7, header_col8 = st.columns([2, 1, 1, 1, 1, 1, 1, 1])
-            with header_col1:
-                st.write("**Patient Name**")
-            with header_col2:
-                st.write("**Risk Level**")
-            with header_col3:
-                st.write("**Age Group**")
-            with header_col4:
-                st.write("**Admission Date**")
-            with header_col5:
-                st.write("**Gender**")
-            with header_col6:
-                st.write("**Department**")
-            with header_col7:
-                st.write("**Length of Stay**")
-            with header_col8:
-                st.write("**Risk Count**")
-            
-            st.divider()
-            
-            # Display patients with clickable names
-            for idx, row in page_data.iterrows():
-                col1, col2, col3, col4, col5, col6, col7, col8 = st.columns([2, 1, 1, 1, 1, 1, 1, 1])
-                
-                with col1:
-                    # Get original patient ID for this row
-                    patient_id = df.loc[idx, 'eid']
-                    if st.button(f"▸ {row['Patient Name']}", key=f"full_list_patient_{patient_id}"):
-                        st.session_state.current_page = "patient_detail"
-                        st.session_state.selected_patient = patient_id
-                        st.rerun()
-                
-                with col2:
-                    # Color code the risk level
-                    risk_color = "●" if row['Risk Level'] == "High Risk" else "○"
-                    st.write(f"{risk_color} {row['Risk Level']}")
-                with col3:
-                    st.write(row['Age Group'])
-                with col4:
-                    st.write(row['Admission Date'])
-                with col5:
-                    st.write(row['Gender'])
-                with col6:
-                    st.write(row['Department'])
-                with col7:
-                    st.write(f"{row['Length of Stay']} days")
-                with col8:
-                    st.write(row['Risk Count'])
+            if not full_list.empty:
+                show_patient_table(full_df, full_list, "full_list")
         else:
             st.info("No patients found with current filters")
     
     with tab2:
         st.markdown("**Search Patients**")
-        search_term = st.text_input("Search by patient name or department:")
+        search_term = st.text_input("Search by patient name or department:", key="patient_search")
+        match_mode = st.radio(
+            "Match:",
+            options=["Contains", "Similar spelling"],
+            horizontal=True,
+            key="patient_search_mode"
+        )
         
-        if search_term and not df.empty:
+        if search_term and not df.empty and match_mode == "Similar spelling":
+            show_fuzzy_matches(full_df, df, search_term)
+        elif search_term and not df.empty:
             # Filter data based on search term
-            search_mask = (
-                df['full_name'].str.contains(search_term, case=False, na=False) |
-                df['facid'].str.contains(search_term, case=False, na=False)
-            )
-            search_results = df[search_mask]
+            search_results = df[search_patients(full_df, df, search_term, "patient_search_result")]
             
             if not search_results.empty:
-                display_cols = ['full_name', 'risk_level', 'age_group', 'vdate', 'gender', 'facid', 'lengthofstay', 'rcount']
-                search_display = search_results[display_cols].copy()
-                search_display['vdate'] = search_display['vdate'].dt.strftime('%Y-%m-%d')
-                
-                search_display = search_display.rename(columns={
-                    'full_name': 'Patient Name',
-                    'age_group': 'Age Group',
-                    'vdate': 'Admission Date', 
-                    'gender': 'Gender',
-                    'facid': 'Department',
-                    'lengthofstay': 'Length of Stay',
-                    'rcount': 'Risk Count'
-                })
-                
-                st.markdown(f"**Search Results** ({len(search_display)} patients)")
-                
-                # Column headers
-                header_col1, header_col2, header_col3, header_col4, header_col5, header_col6, header_col7, header_col8 = st.columns([2, 1, 1, 1, 1, 1, 1, 1])
-                with header_col1:
-                    st.write("**Patient Name**")
-                with header_col2:
-                    st.write("**Risk Level**")
-                with header_col3:
-                    st.write("**Age Group**")
-                with header_col4:
-                    st.write("**Admission Date**")
-                with header_col5:
-                    st.write("**Gender**")
-                with header_col6:
-                    st.write("**Department**")
-                with header_col7:
-                    st.write("**Length of Stay**")
-                with header_col8:
-                    st.write("**Risk Count**")
-                
-                st.divider()
-                
-                # Display search results with clickable names
-                for idx, row in search_display.iterrows():
-                    col1, col2, col3, col4, col5, col6, col7, col8 = st.columns([2, 1, 1, 1, 1, 1, 1, 1])
-                    
-                    with col1:
-                        # Get original patient ID for this row
-                        patient_id = search_results.loc[idx, 'eid']
-                        if st.button(f"▸ {row['Patient Name']}", key=f"search_patient_{patient_id}"):
-                            st.session_state.current_page = "patient_detail"
-                            st.session_state.selected_patient = patient_id
-                            st.rerun()
-                    
-                    with col2:
-                        # Color code the risk level
-                        risk_color = "●" if row['Risk Level'] == "High Risk" else "○"
-                        st.write(f"{risk_color} {row['Risk Level']}")
-                    with col3:
-                        st.write(row['Age Group'])
-                    with col4:
-                        st.write(row['Admission Date'])
-                    with col5:
-                        st.write(row['Gender'])
-                    with col6:
-                        st.write(row['Department'])
-                    with col7:
-                        st.write(f"{row['Length of Stay']} days")
-                    with col8:
-                        st.write(row['Risk Count'])
+                st.markdown(f"**Search Results** ({len(search_results)} patients)")
+                show_patient_table(full_df, search_results, "search_results", default_sort='Patient Name')
             else:
                 st.info(f"No patients found matching '{search_term}'")
+    
+    with tab3:
+        create_clinical_worklist(df, cohort)
+
+def show_fuzzy_matches(full_df, df, query):
+    """Ranked similar-name matches; selecting one opens that patient"""
+    matches = fuzzy_patient_matches(full_df, df, query)
+    if matches.empty:
+        st.info(f"No patient names within a few typos of '{query}'")
+        return
+    
+    st.markdown(f"**Closest Names** ({len(matches)} patients)")
+    match_data = pd.DataFrame({
+        'Patient Name': matches['full_name'].astype(str),
+        'Typos': matches['typos'],
+        'Date of Birth': matches['Date_of_Birth'].dt.strftime('%Y-%m-%d'),
+        'Latest Admission': matches['vdate'].dt.strftime('%Y-%m-%d'),
+        'Department': matches['facid'].astype(str),
+        'Admissions': matches['admissions']
+    })
+    event = st.dataframe(
+        match_data,
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="single-row",
+        key=f"fuzzy_matches_grid_{st.session_state.get('patient_table_nonce', 0)}"
+    )
+    st.caption("Closest first · select a row to open the patient")
+    
+    selected = event.selection.rows if event is not None else []
+    if selected:
+        open_patient(matches['eid'].iloc[selected[0]])
+
+def create_clinical_worklist(df, cohort=None, limit=25):
+    """Patients needing critical action, or ranked by discharge readiness"""
+    view = st.radio(
+        "Worklist:",
+        options=["Critical actions", "Discharge readiness"],
+        horizontal=True,
+        key="clinical_worklist_view"
+    )
+    
+    # Rule masks and discharge_score are computed at load time; only the shown
+    # rows are ranked, once per cohort and view
+    view_key = 'critical' if view == "Critical actions" else 'discharge'
+    total, shown = cohort_aggregate(
+        cohort, f"worklist:{view_key}:{limit}",
+        lambda: (worklist_size(df, view_key), worklist(df, view_key, limit))
+    )
+    if shown.empty:
+        if view == "Critical actions":
+            st.info("No patients with critical actions in the current selection.")
+        else:
+            st.info("No patients in the current selection.")
+        return
+    
+    st.markdown(f"**{view}** ({total} patients, showing {len(shown)})")
+    issues = issue_summary(shown, 'critical')
+    
+    worklist_data = pd.DataFrame({
+        'Patient Name': shown['full_name'].astype(str),
+        'Department': shown['facid'].astype(str),
+        'Discharge Readiness': shown['discharge_score'].astype(str) + '/100',
+        'Critical Issues': issues.replace('', 'No critical issues')
+    })
+    event = st.dataframe(
+        worklist_data,
+        hide_index=True,
+        use_container_width=True,
+        on_select="rerun",
+        selection_mode="single-row",
+        key=f"clinical_worklist_grid_{st.session_state.get('patient_table_nonce', 0)}"
+    )
+    st.caption("Select a row to open the patient")
+    
+    selected = event.selection.rows if event is not None else []
+    if selected:
+        open_patient(shown['eid'].iloc[selected[0]])
 
 def add_floating_agent_chat():
     """Add AI Agent chat widget using ChatKit"""
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Clinical Rules: Priority Actions, risk factors, emergency indicators and
+discharge readiness evaluated over the whole admissions frame at load time
+"""
+
+import numpy as np
+import pandas as pd
+
+MENTAL_HEALTH_COLS = ['depress', 'psychologicaldisordermajor']
+
+PRIORITY_TIERS = ['critical', 'high', 'medium', 'low']
+
+
+def _mental_health(df):
+    return (df[MENTAL_HEALTH_COLS] == 1).any(axis=1)
+
+
+# Priority Actions shown on the patient detail page, one bit per rule in
+# 'priority_mask'. Every test takes the frame and returns a boolean Series.
+PRIORITY_RULES = [
+    # Critical (immediate action needed)
+    {'tier': 'critical', 'issue': 'Severe Hyperglycemia',
+     'action': 'Immediate insulin protocol + hourly glucose monitoring', 'timeline': 'NOW',
+     'test': lambda df: df['glucose'] > 300},
+    {'tier': 'critical', 'issue': 'Severe Kidney Dysfunction',
+     'action': 'Urgent nephrology consult + fluid balance review', 'timeline': 'Within 2 hours',
+     'test': lambda df: df['creatinine'] > 2.0},
+    {'tier': 'critical', 'issue': 'High Heart Rate',
+     'action': 'ECG + cardiac monitoring + vitals q15min', 'timeline': 'NOW',
+     'test': lambda df: df['pulse'] > 120},
+    {'tier': 'critical', 'issue': 'Low Heart Rate',
+     'action': 'ECG + cardiac monitoring + vitals q15min', 'timeline': 'NOW',
+     'test': lambda df: df['pulse'] < 50},
+    {'tier': 'critical', 'issue': 'Severe Anemia',
+     'action': 'Type & cross + consider transfusion', 'timeline': 'Within 1 hour',
+     'test': lambda df: df['hematocrit'] < 8},
+    # High Priority (same day)
+    {'tier': 'high', 'issue': 'Hyperglycemia',
+     'action': 'Adjust insulin regimen + q6h glucose checks', 'timeline': 'Within 4 hours',
+     'test': lambda df: df['glucose'] > 180},
+    {'tier': 'high', 'issue': 'Kidney Function Decline',
+     'action': 'Review medications + increase monitoring', 'timeline': 'Today',
+     'test': lambda df: df['creatinine'] > 1.5},
+    {'tier': 'high', 'issue': 'Extended Stay Risk',
+     'action': 'Discharge planning meeting + complications review', 'timeline': 'Today',
+     'test': lambda df: df['lengthofstay'] > 10},
+    # Medium Priority (24-48 hours)
+    {'tier': 'medium', 'issue': 'Anemia',
+     'action': 'Iron studies + nutrition consult', 'timeline': 'Within 24h',
+     'test': lambda df: df['hematocrit'] < 12},
+    {'tier': 'medium', 'issue': 'Underweight',
+     'action': 'Nutrition assessment + calorie count', 'timeline': 'Within 48h',
+     'test': lambda df: df['bmi'] < 18.5},
+    {'tier': 'medium', 'issue': 'Mental Health Needs',
+     'action': 'Psychology/psychiatry consult', 'timeline': 'Within 48h',
+     'test': _mental_health},
+    # Low Priority (routine care)
+    {'tier': 'low', 'issue': 'Weight Management',
+     'action': 'Dietary counseling + activity plan', 'timeline': 'Before discharge',
+     'test': lambda df: df['bmi'] > 25},
+    {'tier': 'low', 'issue': 'Readmission Risk',
+     'action': 'Enhanced discharge education + follow-up', 'timeline': 'Before discharge',
+     'test': lambda df: df['readmit_flag'] == 1},
+]
+
+# Bits of 'priority_mask' belonging to each tier
+TIER_MASKS = {
+    tier: sum(1 << i for i, rule in enumerate(PRIORITY_RULES) if rule['tier'] == tier)
+    for tier in PRIORITY_TIERS
+}
+
+# Risk Assessment bullets, one bit each in 'risk_mask'; tests also get the LOS thresholds
+RISK_FACTORS = [
+    {'label': 'Extended length of stay', 'alert': False,
+     'test': lambda df, t: df['lengthofstay'] > t['long_stay']},
+    {'label': 'Previous readmission', 'alert': False,
+     'test': lambda df, t: df['readmit_flag'] == 1},
+    {'label': 'Advanced age', 'alert': False,
+     'test': lambda df, t: df['age_at_admission'] > 65},
+    {'label': 'Elevated creatinine', 'alert': False,
+     'test': lambda df, t: df['creatinine'] > 1.2},
+    {'label': 'Elevated glucose', 'alert': False,
+     'test': lambda df, t: df['glucose'] > 140},
+    {'label': 'Low hematocrit', 'alert': True,
+     'test': lambda df, t: df['hematocrit'] < 12},
+    {'label': 'High hematocrit', 'alert': True,
+     'test': lambda df, t: df['hematocrit'] > 16},
+]
+
+# Emergency Information alert conditions, one bit each in 'emergency_mask'
+EMERGENCY_INDICATORS = [
+    {'label': 'Severe kidney dysfunction', 'test': lambda df: df['creatinine'] > 2.0},
+    {'label': 'Severe hyperglycemia', 'test': lambda df: df['glucose'] > 300},
+    {'label': 'High heart rate', 'test': lambda df: df['pulse'] > 120},
+    {'label': 'Low heart rate', 'test': lambda df: df['pulse'] < 50},
+    {'label': 'Severe anemia', 'test': lambda df: df['hematocrit'] < 8},
+]
+
+# Discharge readiness factors; bit i is set in 'discharge_ready_mask' or in
+# 'discharge_blocking_mask' (or neither) depending on the patient
+DISCHARGE_FACTORS = [
+    {'ready': 'Medical condition stable', 'blocking': 'Unresolved critical/high priority issues'},
+    {'ready': 'Glucose controlled', 'blocking': 'Uncontrolled glucose'},
+    {'ready': 'Kidney function stable', 'blocking': 'Kidney function concerns'},
+    {'ready': 'Adequate blood levels', 'blocking': 'Severe anemia needs treatment'},
+    {'ready': 'Appropriate length of stay', 'blocking': 'Extended stay - investigate barriers'},
+    {'ready': 'Nutrition adequate', 'blocking': 'Nutrition concerns need addressing'},
+    {'ready': 'Mental health stable', 'blocking': 'Mental health needs ongoing care'},
+]
+
+RULE_COLS = ['priority_mask', 'risk_mask', 'emergency_mask',
+             'discharge_ready_mask', 'discharge_blocking_mask', 'discharge_score']
+
+
+def _mask(tests, dtype):
+    """Pack a list of boolean Series into one bitmask per row"""
+    mask = np.zeros(len(tests[0]), dtype=dtype)
+    for bit, passed in enumerate(tests):
+        mask |= np.asarray(passed, dtype=bool).astype(dtype) << dtype(bit)
+    return mask
+
+
+def discharge_readiness(df, priority_mask):
+    """Discharge readiness score (0-100) with its ready and blocking factor masks"""
+    glucose = df['glucose'].to_numpy(dtype=np.float64)
+    creatinine = df['creatinine'].to_numpy(dtype=np.float64)
+    hematocrit = df['hematocrit'].to_numpy(dtype=np.float64)
+    los = df['lengthofstay'].to_numpy(dtype=np.float64)
+
+    # Medical stability (40% of score)
+    stable = (priority_mask & (TIER_MASKS['critical'] | TIER_MASKS['high'])) == 0
+    # Lab values stability (30% of score)
+    glucose_ok = (glucose >= 70) & (glucose <= 180)
+    creatinine_ok = (creatinine >= 0.6) & (creatinine <= 1.5)
+    hematocrit_ok = hematocrit >= 10
+    stable_labs = glucose_ok.astype(int) + creatinine_ok + hematocrit_ok
+    # Length of stay consideration (20% of score)
+    short_stay = los <= 7
+    long_stay = los > 14
+    # Social factors (10% of score)
+    nourished = (df['malnutrition'] == 0).to_numpy()
+    mental_ok = ~_mental_health(df).to_numpy()
+
+    score = (40 * stable + 10 * stable_labs +
+             np.where(short_stay, 20, np.where(long_stay, 0, 10)) +
+             5 * nourished + 5 * mental_ok)
+
+    ready = _mask([stable, glucose_ok, creatinine_ok, hematocrit_ok, short_stay,
+                   nourished, mental_ok], np.uint8)
+    blocking = _mask([~stable, glucose > 180, creatinine > 1.5, ~hematocrit_ok, long_stay,
+                      ~nourished, ~mental_ok], np.uint8)
+    return score.astype(np.int8), ready, blocking
+
+
+def apply_clinical_rules(df, thresholds):
+    """Add the rule bitmasks and discharge_score columns to the frame"""
+    df['priority_mask'] = _mask([rule['test'](df) for rule in PRIORITY_RULES], np.uint16)
+    df['risk_mask'] = _mask([factor['test'](df, thresholds) for factor in RISK_FACTORS], np.uint8)
+    df['emergency_mask'] = _mask([indicator['test'](df) for indicator in EMERGENCY_INDICATORS], np.uint8)
+    score, ready, blocking = discharge_readiness(df, df['priority_mask'].to_numpy())
+    df['discharge_ready_mask'] = ready
+    df['discharge_blocking_mask'] = blocking
+    df['discharge_score'] = score
+    return df
+
+
+def has_tier(df, tier):
+    """Boolean Series of rows with at least one Priority Action in the tier"""
+    return (df['priority_mask'] & TIER_MASKS[tier]) != 0
+
+
+def decode(mask, items, tier=None):
+    """Rules whose bit is set in one patient's mask, optionally limited to a tier"""
+    mask = int(mask)
+    return [item for bit, item in enumerate(items)
+            if mask >> bit & 1 and (tier is None or item.get('tier') == tier)]
+
+
+def worklist(df, view='critical', limit=None):
+    """Patients with critical actions, or everyone by discharge readiness
+
+    With a limit only the first rows are returned, selected without sorting
+    the rest (same order as the full sort, ties in row order).
+    """
+    if view == 'critical':
+        rows = df[has_tier(df, 'critical')]
+        if limit is not None:
+            return rows.nsmallest(limit, 'discharge_score', keep='first')
+        return rows.sort_values('discharge_score', kind='stable')
+    if limit is not None:
+        return df.nlargest(limit, 'discharge_score', keep='first')
+    return df.sort_values('discharge_score', ascending=False, kind='stable')
+
+
+def worklist_size(df, view='critical'):
+    """Number of patients worklist() ranks for a view"""
+    if view == 'critical':
+        return int(has_tier(df, 'critical').sum())
+    return len(df)
+
+
+def issue_summary(df, tier='critical'):
+    """Comma-separated issues of a tier for every row, built one rule at a time"""
+    summary = pd.Series('', index=df.index)
+    for bit, rule in enumerate(PRIORITY_RULES):
+        if rule['tier'] != tier:
+            continue
+        hit = (df['priority_mask'].to_numpy() >> bit & 1).astype(bool)
+        summary[hit] = np.where(summary[hit] == '', rule['issue'], summary[hit] + ', ' + rule['issue'])
+    return summary
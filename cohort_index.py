@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+"""
+Cohort Index: in-memory indexes that answer the dashboard's sidebar filters
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from data_pipeline import quantile_from_counts
+
+
+class DateIndex:
+    """Sorted vdate values answering date ranges with binary search
+
+    load_admissions() keeps the frame in vdate order, in which case a date
+    range is a contiguous slice of rows. For an unsorted frame a sorted
+    permutation is kept instead and the range maps to an index array.
+    """
+
+    def __init__(self, df):
+        self.data_version = df.attrs.get('data_version')
+        vdates = df['vdate'].to_numpy(dtype='datetime64[ns]')
+
+        # NaT sorts last in NumPy, so it never falls inside a range
+        order = np.argsort(vdates, kind='stable')
+        self.order = None if np.array_equal(order, np.arange(len(order))) else order
+        self.sorted_vdates = vdates if self.order is None else vdates[order]
+        self.n_dated = len(vdates) - int(np.isnat(vdates).sum())
+
+    def min_date(self):
+        return pd.Timestamp(self.sorted_vdates[0]).date() if self.n_dated else None
+
+    def max_date(self):
+        return pd.Timestamp(self.sorted_vdates[self.n_dated - 1]).date() if self.n_dated else None
+
+    def bounds(self, start_date, end_date):
+        """Positions [lo, hi) in sorted order of admissions on start_date..end_date"""
+        start = np.datetime64(pd.Timestamp(start_date), 'ns')
+        stop = np.datetime64(pd.Timestamp(end_date) + pd.Timedelta(days=1), 'ns')
+        lo = int(np.searchsorted(self.sorted_vdates[:self.n_dated], start, side='left'))
+        hi = int(np.searchsorted(self.sorted_vdates[:self.n_dated], stop, side='left'))
+        return lo, max(lo, hi)
+
+    def rows_between(self, start_date, end_date):
+        """Rows admitted on start_date..end_date, as a slice or a row-position array"""
+        lo, hi = self.bounds(start_date, end_date)
+        if self.order is None:
+            return slice(lo, hi)
+        return np.sort(self.order[lo:hi])
+
+    def cohort_rows_between(self, rows, start_date, end_date):
+        """The part of a sorted row-position array admitted on start_date..end_date
+
+        On a vdate-ordered frame the cohort's own vdates are sorted, so this
+        is a binary search over the cohort rather than a pass over all rows.
+        """
+        if self.order is not None:
+            return rows[np.isin(rows, self.rows_between(start_date, end_date))]
+        lo, hi = self.bounds(start_date, end_date)
+        return rows[np.searchsorted(rows, lo):np.searchsorted(rows, hi)]
+
+
+# Set-bit count of every possible byte, for popcounts over packed bitmaps
+_POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+
+class BitmapIndex:
+    """One packed bitset per value of each sidebar filter dimension
+
+    A filter is answered by ORing the bitsets of the selected values within
+    a dimension and ANDing across dimensions. Popcounts of the same bitsets
+    give the facet counts shown under each multiselect.
+    """
+
+    DIMENSIONS = ['gender', 'facid', 'age_group', 'risk_level']
+
+    def __init__(self, df, dimensions=DIMENSIONS):
+        self.data_version = df.attrs.get('data_version')
+        self.n_rows = len(df)
+        self.values = {}
+        self.bitmaps = {}
+
+        for dim in dimensions:
+            values = df[dim].astype('category')
+            codes = values.cat.codes.to_numpy()
+            self.bitmaps[dim] = {}
+            for code, value in enumerate(values.cat.categories):
+                bitmap = np.packbits(codes == code)
+                if _POPCOUNT[bitmap].any():
+                    self.bitmaps[dim][value] = bitmap
+            self.values[dim] = list(self.bitmaps[dim])
+
+    def _empty(self):
+        return np.zeros((self.n_rows + 7) // 8, dtype=np.uint8)
+
+    def rows_bitmap(self, rows=None):
+        """Bitmap of a row slice or row-position array (all rows if None)"""
+        if rows is None:
+            return np.packbits(np.ones(self.n_rows, dtype=bool))
+        selected = np.zeros(self.n_rows, dtype=bool)
+        selected[rows] = True
+        return np.packbits(selected)
+
+    def dimension_bitmap(self, dim, values):
+        """OR of the bitsets of the selected values of one dimension"""
+        bitmap = self._empty()
+        for value in values:
+            if value in self.bitmaps[dim]:
+                bitmap |= self.bitmaps[dim][value]
+        return bitmap
+
+    def match(self, selections, rows=None, exclude=None):
+        """Bitmap of rows passing every selection; an empty selection means no filter"""
+        bitmap = self.rows_bitmap(rows)
+        for dim, values in selections.items():
+            if dim != exclude and values:
+                bitmap &= self.dimension_bitmap(dim, values)
+        return bitmap
+
+    def positions(self, bitmap):
+        """Row positions of the set bits"""
+        return np.flatnonzero(np.unpackbits(bitmap, count=self.n_rows))
+
+    def count(self, bitmap):
+        return int(_POPCOUNT[bitmap].sum(dtype=np.int64))
+
+    def facet_counts(self, dim, selections, rows=None):
+        """Rows per value of dim under every other dimension's selection"""
+        base = self.match(selections, rows, exclude=dim)
+        return {value: self.count(base & bitmap) for value, bitmap in self.bitmaps[dim].items()}
+
+
+class PatientIndex:
+    """Hash lookups from eid to row position and from a patient to their admissions
+
+    A patient is identified by full_name plus Date_of_Birth, since names
+    alone collide. Each patient's rows are stored contiguously in vdate
+    order (offsets into one position array), so a detail page costs the
+    same whatever the size of the dataset.
+    """
+
+    def __init__(self, df):
+        self.data_version = df.attrs.get('data_version')
+        self.eid_positions = dict(zip(df['eid'].tolist(), range(len(df))))
+
+        identity = pd.MultiIndex.from_arrays([
+            df['full_name'].astype(str).to_numpy(),
+            pd.to_datetime(df['Date_of_Birth']).to_numpy()
+        ])
+        codes, _ = pd.factorize(identity)
+        self.row_identity = codes
+        # Group by patient, then by admission date within each patient
+        vdate = df['vdate'].to_numpy(dtype='datetime64[ns]').astype(np.int64)
+        self.order = np.lexsort((np.arange(len(df)), vdate, codes))
+        counts = np.bincount(codes[codes >= 0], minlength=codes.max() + 1 if len(codes) else 0)
+        self.offsets = np.concatenate([[0], np.cumsum(counts)])
+
+    def position(self, eid):
+        """Row position of an admission, or None if the eid is unknown"""
+        return self.eid_positions.get(eid)
+
+    def history(self, position):
+        """Row positions of every admission of the same patient, in vdate order"""
+        code = self.row_identity[position]
+        if code < 0:
+            return np.array([position])
+        return self.order[self.offsets[code]:self.offsets[code + 1]]
+
+
+class SortIndex:
+    """Presorted row permutations for the patient table's sort columns
+
+    Sorting a cohort keeps the permutation entries whose rows are in the
+    cohort, which preserves their order. That is one gather per request,
+    with no comparisons, and it gives the same order as a stable sort of
+    the cohort itself.
+    """
+
+    COLUMNS = ['vdate', 'lengthofstay', 'full_name', 'facid', 'risk_level']
+
+    def __init__(self, df, columns=None):
+        self.data_version = df.attrs.get('data_version')
+        self.n_rows = len(df)
+        self.ascending = {}
+        self.descending = {}
+        for col in columns or self.COLUMNS:
+            values = df[col].reset_index(drop=True)
+            # Separate descending permutation keeps ties in row order, as a stable sort does
+            self.ascending[col] = values.sort_values(
+                kind='stable', na_position='last').index.to_numpy(dtype=np.int64)
+            self.descending[col] = values.sort_values(
+                ascending=False, kind='stable', na_position='last').index.to_numpy(dtype=np.int64)
+
+    def order(self, col, positions=None, descending=False):
+        """Row positions of a cohort (all rows when None) sorted by a column"""
+        perm = (self.descending if descending else self.ascending)[col]
+        if positions is None or len(positions) == self.n_rows:
+            return perm
+        member = np.zeros(self.n_rows, dtype=bool)
+        member[positions] = True
+        return perm[member[perm]]
+
+
+class CohortCache:
+    """Process-wide bounded LRU of filtered cohorts and their chart aggregates
+
+    Keys are the normalized filter tuple plus the data version (see
+    cohort_key), so reruns that do not change the filters - paging the
+    patient table, switching a chart option - reuse the cohort's row
+    positions and every aggregate already computed for it. Row positions
+    are stored as int32 where they fit, and the cache is bounded by the
+    total size of the positions and aggregates as well as by entry count.
+    """
+
+    def __init__(self, max_entries=64, max_bytes=256 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.aggregate_hits = 0
+        self.aggregate_misses = 0
+
+    def get(self, key, compute_rows):
+        """Cached cohort entry for key, computing its row positions on a miss"""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        rows = np.asarray(compute_rows())
+        if rows.dtype.itemsize > 4 and (len(rows) == 0 or rows.max() < np.iinfo(np.int32).max):
+            rows = rows.astype(np.int32)
+        entry = {'key': key, 'rows': rows, 'aggregates': {}, 'nbytes': rows.nbytes}
+        with self.lock:
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous['nbytes']
+            self.entries[key] = entry
+            self.nbytes += entry['nbytes']
+            self._evict()
+        return entry
+
+    def _evict(self):
+        # Least recently used first; the newest entry always stays, even if
+        # it alone exceeds max_bytes
+        while len(self.entries) > 1 and (len(self.entries) > self.max_entries or
+                                         self.nbytes > self.max_bytes):
+            _, evicted = self.entries.popitem(last=False)
+            self.nbytes -= evicted['nbytes']
+
+    def aggregate(self, entry, name, compute):
+        """Aggregate memoized on a cohort entry; computed directly without one"""
+        if entry is None:
+            return compute()
+        with self.lock:
+            if name in entry['aggregates']:
+                self.aggregate_hits += 1
+                return entry['aggregates'][name]
+            self.aggregate_misses += 1
+        value = compute()
+        size = value_nbytes(value)
+        with self.lock:
+            if name in entry['aggregates']:
+                return entry['aggregates'][name]
+            entry['aggregates'][name] = value
+            entry['nbytes'] += size
+            # An entry evicted meanwhile is no longer counted
+            if self.entries.get(entry['key']) is entry:
+                self.nbytes += size
+                self._evict()
+        return value
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'entries': len(self.entries),
+                'max_entries': self.max_entries,
+                'nbytes': self.nbytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'aggregate_hits': self.aggregate_hits,
+                'aggregate_misses': self.aggregate_misses
+            }
+
+
+def value_nbytes(value):
+    """Approximate memory held by a cached aggregate (arrays, frames and containers of them)"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(value_nbytes(k) + value_nbytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(value_nbytes(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def cohort_key(data_version, start_date, end_date, selections):
+    """Normalized, hashable form of the sidebar filters"""
+    return (
+        data_version,
+        str(start_date),
+        str(end_date),
+        tuple((dim, tuple(sorted(str(v) for v in values)))
+              for dim, values in sorted(selections.items()))
+    )
+
+
+class AdmissionCube:
+    """Pre-aggregated cube over month x facid x gender x age_group x risk_level
+
+    Each cell holds the admission count, sum and sum of squares of
+    lengthofstay, the count of stays over 7 days and the readmission count.
+    A sidebar filter is answered by summing the selected cells, so the cost
+    depends on the number of filter values rather than the number of rows.
+    Months only partly covered by the date range are topped up from the
+    matching raw rows of those days.
+
+    Each cell also keeps a histogram over the distinct LOS values (a day
+    count, so there are few). Summed over a cohort's cells it is an exact,
+    mergeable sketch of the cohort's LOS distribution, giving percentiles
+    without touching the rows.
+    """
+
+    LOS_PERCENTILES = [0.5, 0.75, 0.9]
+
+    DIMENSIONS = ['month', 'facid', 'gender', 'age_group', 'risk_level']
+    MEASURES = ['count', 'los_sum', 'los_sumsq', 'long_stay', 'readmit']
+
+    def __init__(self, df):
+        self.data_version = df.attrs.get('data_version')
+        self.labels = {}
+        codes = []
+        for dim in self.DIMENSIONS:
+            values = df[dim].astype('category')
+            if 'NaT' in values.cat.categories:
+                values = values.cat.remove_categories(['NaT'])
+            dim_codes = values.cat.codes.to_numpy().astype(np.int64)
+            # Missing values get their own slot after the real categories
+            dim_codes[dim_codes < 0] = len(values.cat.categories)
+            self.labels[dim] = list(values.cat.categories)
+            codes.append(dim_codes)
+        self.shape = tuple(len(self.labels[dim]) + 1 for dim in self.DIMENSIONS)
+
+        los = df['lengthofstay'].to_numpy(dtype=np.float64)
+        self.row_measures = np.column_stack([
+            np.ones(len(df)),
+            los,
+            los ** 2,
+            (los > 7).astype(np.float64),
+            df['readmit_flag'].to_numpy(dtype=np.float64)
+        ])
+        self.row_month = codes[0]
+        self.row_facid = codes[1]
+
+        flat = np.ravel_multi_index(codes, self.shape)
+        size = int(np.prod(self.shape))
+        self.cube = np.stack([
+            np.bincount(flat, weights=self.row_measures[:, k], minlength=size)
+            for k in range(len(self.MEASURES))
+        ], axis=-1).reshape(self.shape + (len(self.MEASURES),))
+
+        # Cell x LOS value counts; rows without a LOS fall outside the histogram
+        self.los_values = np.unique(los[~np.isnan(los)])
+        self.row_los = np.searchsorted(self.los_values, los)
+        has_los = ~np.isnan(los)
+        self.row_los[~has_los] = len(self.los_values)
+        n_los = len(self.los_values) + 1
+        self.los_hist = np.bincount(flat * n_los + self.row_los, minlength=size * n_los).reshape(
+            self.shape + (n_los,))[..., :-1]
+
+        periods = pd.PeriodIndex(self.labels['month'], freq='M')
+        self.month_start = [p.start_time.date() for p in periods]
+        self.month_end = [p.end_time.date() for p in periods]
+
+    def _dimension_index(self, dim, values):
+        """Cube positions for a selection; an empty selection keeps every slot"""
+        if not values:
+            return np.arange(self.shape[self.DIMENSIONS.index(dim)])
+        wanted = {str(v) for v in values}
+        return np.array([i for i, label in enumerate(self.labels[dim]) if str(label) in wanted],
+                        dtype=np.int64)
+
+    def query(self, selections, start_date=None, end_date=None, edge_rows=None):
+        """KPI and department statistics for a filtered cohort
+
+        edge_rows(start, end) must return the positions of rows passing the
+        selections with vdate in [start, end]; it is only called for months
+        the date range covers partially.
+        """
+        n_month = len(self.labels['month'])
+        full_months, partial_months = [], []
+        for i in range(n_month):
+            if ((start_date is None or self.month_start[i] >= start_date) and
+                    (end_date is None or self.month_end[i] <= end_date)):
+                full_months.append(i)
+            elif ((start_date is None or self.month_end[i] >= start_date) and
+                    (end_date is None or self.month_start[i] <= end_date)):
+                partial_months.append(i)
+        if start_date is None and end_date is None:
+            full_months.append(n_month)  # admissions without a vdate
+
+        index = [np.array(full_months, dtype=np.int64)]
+        index += [self._dimension_index(dim, selections.get(dim)) for dim in self.DIMENSIONS[1:]]
+
+        # month x facid x measures
+        totals = np.zeros((self.shape[0], self.shape[1], len(self.MEASURES)))
+        los_counts = np.zeros(len(self.los_values), dtype=np.int64)
+        if all(len(ix) for ix in index):
+            cells = self.cube[np.ix_(*index)].sum(axis=(2, 3, 4))
+            totals[np.ix_(index[0], index[1])] += cells
+            los_counts += self.los_hist[np.ix_(*index)].sum(axis=(0, 1, 2, 3, 4))
+
+        for i in partial_months:
+            rows = edge_rows(max(start_date, self.month_start[i]), min(end_date, self.month_end[i]))
+            np.add.at(totals, (self.row_month[rows], self.row_facid[rows]), self.row_measures[rows])
+            los_counts += np.bincount(self.row_los[rows], minlength=len(self.los_values) + 1)[:-1]
+
+        return self._summarize(totals, los_counts)
+
+    def _summarize(self, totals, los_counts):
+        count, los_sum, los_sumsq, long_stay, readmit = totals.sum(axis=(0, 1))
+        avg_los = los_sum / count if count else float('nan')
+        kpis = {
+            'count': int(count),
+            'avg_los': avg_los,
+            'los_std': float(np.sqrt(max(los_sumsq / count - avg_los ** 2, 0))) if count else float('nan'),
+            'long_stay_rate': long_stay / count * 100 if count else float('nan'),
+            'readmit_rate': readmit / count * 100 if count else float('nan'),
+            'turnover': 365 / avg_los if count else float('nan')
+        }
+        observed = los_counts > 0
+        for q in self.LOS_PERCENTILES:
+            kpis[f'los_p{int(q * 100)}'] = (
+                quantile_from_counts(self.los_values[observed], los_counts[observed], q)
+                if observed.any() else float('nan'))
+
+        by_facid = totals[:-1].sum(axis=0)[:-1]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            dept_stats = pd.DataFrame({
+                'facid': self.labels['facid'],
+                'mean': by_facid[:, 1] / by_facid[:, 0],
+                'count': by_facid[:, 0].astype(np.int64)
+            })
+
+        return {'kpis': kpis, 'dept_stats': dept_stats}
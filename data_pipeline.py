@@ -0,0 +1,691 @@
+#!/usr/bin/env python3
+"""
+Data Pipeline: load, preprocess and snapshot the admissions dataset
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import numpy as np
+import pandas as pd
+
+from analytics_engine import BedCensus
+from clinical_rules import apply_clinical_rules
+
+# Parquet snapshots need pyarrow; without it we always rebuild from the CSV
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+DATA_PATH = "data/LengthOfStay.csv"
+SNAPSHOT_DIR = "data/cache"
+
+# Bump whenever preprocess_admissions() changes the columns or dtypes it produces
+SCHEMA_VERSION = 4
+
+# Disease columns for analysis
+DISEASE_COLS = ['dialysisrenalendstage', 'asthma', 'irondef', 'pneum',
+                'substancedependence', 'psychologicaldisordermajor',
+                'depress', 'psychother', 'fibrosisandother', 'malnutrition']
+
+# Compact schema - low-cardinality strings become categoricals (one shared copy
+# of each distinct value), 0/1 flags become int8, lab values become float32
+CATEGORY_COLS = ['facid', 'gender', 'rcount', 'admission_reason', 'First_Name', 'Last_Name']
+FLAG_COLS = DISEASE_COLS + ['hemo']
+SMALL_INT_COLS = {
+    'eid': 'int32',
+    'lengthofstay': 'int16',
+    'pulse': 'int16',
+    'secondarydiagnosisnonicd9': 'int8'
+}
+FLOAT32_COLS = ['hematocrit', 'neutrophils', 'sodium', 'glucose', 'bloodureanitro',
+                'creatinine', 'bmi', 'respiration', 'age_at_admission']
+DERIVED_CATEGORY_COLS = ['month', 'full_name']
+DERIVED_FLAG_COLS = ['is_long_stay', 'readmit_flag']
+RISK_LEVELS = ['Standard Risk', 'High Risk']
+
+# Admission exports always write dates as MM/DD/YYYY (see scripts/update_dates.py)
+DATE_FORMAT = '%m/%d/%Y'
+DATE_COLS = ['vdate', 'discharged', 'Date_of_Birth']
+
+
+def csv_content_hash(path, block_size=1 << 20):
+    """Return the SHA-256 hex digest of a file, read in fixed-size blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_admissions_csv(path=DATA_PATH, compact=True, chunksize=None):
+    """Read the raw CSV, parsing string columns straight into categoricals
+
+    With chunksize set this returns an iterator of frames, as pd.read_csv does.
+    """
+    # Date strings are read as categoricals too, so parse_date_column only
+    # has to parse each distinct date once
+    dtype = {col: 'category' for col in DATE_COLS}
+    if compact:
+        dtype.update({col: 'category' for col in CATEGORY_COLS})
+    return pd.read_csv(path, dtype=dtype, chunksize=chunksize)
+
+
+def parse_date_column(values, fmt=DATE_FORMAT):
+    """Parse a column of date strings through a cache of its unique values
+
+    Each distinct string is parsed once with the known format; only strings
+    that do not match it go through pandas' slower format inference. Returns
+    the parsed datetime64 array and a dict describing anything that failed.
+    """
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Index(uniques).astype(str)
+
+    parsed = pd.to_datetime(uniques, format=fmt, errors='coerce')
+    parsed = parsed.to_numpy(dtype='datetime64[us]', copy=True)
+    slow_path = np.isnat(parsed)
+    if slow_path.any():
+        fallback = pd.to_datetime(uniques[slow_path], format='mixed', errors='coerce')
+        parsed[slow_path] = fallback.to_numpy(dtype='datetime64[us]')
+
+    # Append NaT so that missing values (code -1) map onto it
+    lookup = np.append(parsed, np.datetime64('NaT', 'us'))
+    result = lookup[codes]
+
+    failed_rows = np.flatnonzero((codes >= 0) & np.isnat(result))
+    report = {
+        'rows': len(codes),
+        'unique_values': len(uniques),
+        'inferred_format': int((slow_path & ~np.isnat(parsed)).sum()),
+        'failed': len(failed_rows),
+        'failed_rows': failed_rows[:20].tolist(),
+        'failed_values': [str(uniques[codes[i]]) for i in failed_rows[:20]]
+    }
+    return result, report
+
+
+def ingest_dates(df, fmt=DATE_FORMAT):
+    """Parse the admission date columns and compute age at admission
+
+    Returns a validation report keyed by column name.
+    """
+    report = {}
+    for col in DATE_COLS:
+        df[col], report[col] = parse_date_column(df[col], fmt)
+
+    # Whole-day difference, same as (vdate - Date_of_Birth).dt.days
+    age_days = (df['vdate'].to_numpy(dtype='datetime64[D]').astype(np.int64) -
+                df['Date_of_Birth'].to_numpy(dtype='datetime64[D]').astype(np.int64))
+    age_at_admission = age_days / 365.25
+    age_at_admission[df['vdate'].isna().to_numpy() | df['Date_of_Birth'].isna().to_numpy()] = np.nan
+    df['age_at_admission'] = age_at_admission
+
+    for col, col_report in report.items():
+        if col_report['failed']:
+            print(f"Date validation: {col_report['failed']} rows in '{col}' could not be parsed, "
+                  f"e.g. {col_report['failed_values'][:3]}")
+
+    return report
+
+
+def _downcast_int(series, dtype):
+    """Cast to a smaller integer type only if every value fits"""
+    if series.isna().any() or not pd.api.types.is_integer_dtype(series):
+        return series
+    info = np.iinfo(dtype)
+    if len(series) and (series.min() < info.min or series.max() > info.max):
+        return series
+    return series.astype(dtype)
+
+
+def apply_compact_schema(df):
+    """Downcast the admissions frame to the compact schema, where that is lossless"""
+    for col in CATEGORY_COLS + DERIVED_CATEGORY_COLS:
+        if col in df.columns and not isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].astype('category')
+
+    for col in FLAG_COLS + DERIVED_FLAG_COLS:
+        if col in df.columns and df[col].isin([0, 1]).all():
+            df[col] = df[col].astype('int8')
+
+    for col, dtype in SMALL_INT_COLS.items():
+        if col in df.columns:
+            df[col] = _downcast_int(df[col], dtype)
+
+    for col in FLOAT32_COLS:
+        if col in df.columns and pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype('float32')
+
+    if 'risk_level' in df.columns:
+        df['risk_level'] = pd.Categorical(df['risk_level'], categories=RISK_LEVELS)
+
+    return df
+
+
+def memory_report(before, after):
+    """Per-column memory usage of two versions of the same frame, in bytes"""
+    report = pd.DataFrame({
+        'dtype_before': before.dtypes.astype(str),
+        'dtype_after': after.dtypes.astype(str).reindex(before.columns),
+        'bytes_before': before.memory_usage(deep=True, index=False),
+        'bytes_after': after.memory_usage(deep=True, index=False).reindex(before.columns)
+    })
+    report.loc['TOTAL'] = ['', '', report['bytes_before'].sum(), report['bytes_after'].sum()]
+    report['saved_pct'] = (1 - report['bytes_after'] / report['bytes_before']) * 100
+    return report
+
+
+def los_thresholds(lengthofstay):
+    """LOS cut-offs behind is_long_stay (75th percentile) and High Risk (90th)
+
+    Accepts raw LOS values or a QuantileSketch of them.
+    """
+    sketch = lengthofstay if isinstance(lengthofstay, QuantileSketch) else QuantileSketch.from_values(lengthofstay)
+    return {
+        'long_stay': sketch.quantile(0.75),
+        'high_risk': sketch.quantile(0.9)
+    }
+
+
+def preprocess_admissions(df, compact=True, thresholds=None):
+    """Convert dates and build the derived columns used by the dashboard
+
+    thresholds defaults to los_thresholds() of this frame; chunked ingest
+    passes the thresholds of the whole file instead. The date validation
+    report of ingest_dates() is kept in df.attrs['date_report'].
+    """
+    if thresholds is None:
+        thresholds = los_thresholds(df['lengthofstay'])
+
+    # Convert dates and calculate age at admission
+    date_report = ingest_dates(df)
+
+    # Create derived features
+    df['month'] = df['vdate'].dt.to_period('M').astype(str)
+    df['is_long_stay'] = (df['lengthofstay'] > thresholds['long_stay']).astype(int)
+    df['readmit_flag'] = (df['rcount'] != '0').astype(int)
+
+    df['age_group'] = pd.cut(df['age_at_admission'],
+                             bins=[0, 18, 35, 50, 65, 80, 100],
+                             labels=['0-18', '19-35', '36-50', '51-65', '66-80', '80+'])
+
+    # Create full name for patient identification
+    df['full_name'] = df['First_Name'].astype(str) + ' ' + df['Last_Name'].astype(str)
+
+    # Create risk level categorization
+    df['risk_level'] = 'Standard Risk'
+    high_risk_mask = (
+        (df['lengthofstay'] > thresholds['high_risk']) |
+        (df['readmit_flag'] == 1)
+    )
+    df.loc[high_risk_mask, 'risk_level'] = 'High Risk'
+
+    # Priority Actions, risk factors and discharge readiness for every row
+    apply_clinical_rules(df, thresholds)
+
+    if compact:
+        df = apply_compact_schema(df)
+
+    df.attrs['date_report'] = date_report
+    return df
+
+
+class SnapshotCache:
+    """Columnar snapshot of the preprocessed admissions frame
+
+    A snapshot is valid only for the exact CSV bytes (content hash) and the
+    SCHEMA_VERSION it was written with. A small manifest remembers the CSV's
+    size and mtime so an unchanged file does not have to be re-hashed.
+    """
+
+    def __init__(self, csv_path=DATA_PATH, cache_dir=SNAPSHOT_DIR):
+        self.csv_path = csv_path
+        self.cache_dir = cache_dir
+        self.manifest_path = os.path.join(cache_dir, 'manifest.json')
+
+    def is_available(self):
+        """Check if snapshots can be read and written"""
+        return PARQUET_AVAILABLE
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_manifest(self, manifest):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, self.manifest_path)
+
+    def content_hash(self):
+        """Hash of the current CSV, reusing the manifest when size and mtime match"""
+        stat = os.stat(self.csv_path)
+        manifest = self._read_manifest()
+        if (manifest.get('csv_size') == stat.st_size and
+                manifest.get('csv_mtime_ns') == stat.st_mtime_ns and
+                manifest.get('content_hash')):
+            return manifest['content_hash']
+        return csv_content_hash(self.csv_path)
+
+    def snapshot_path(self, content_hash):
+        """Snapshot file name carries both the content hash and the schema version"""
+        return os.path.join(self.cache_dir,
+                            f"admissions-{content_hash[:16]}-v{SCHEMA_VERSION}.parquet")
+
+    def load(self, content_hash):
+        """Return the cached frame for this content hash, or None on a miss"""
+        if not self.is_available():
+            return None
+
+        manifest = self._read_manifest()
+        path = self.snapshot_path(content_hash)
+        if (manifest.get('content_hash') != content_hash or
+                manifest.get('schema_version') != SCHEMA_VERSION or
+                not os.path.exists(path)):
+            return None
+
+        try:
+            return pd.read_parquet(path)
+        except Exception as e:
+            print(f"Snapshot read failed, rebuilding from CSV: {e}")
+            return None
+
+    def save(self, df, content_hash):
+        """Write the frame atomically and drop snapshots of older CSV versions"""
+        if not self.is_available():
+            return
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            path = self.snapshot_path(content_hash)
+            tmp_path = path + '.tmp'
+            df.to_parquet(tmp_path, index=False)
+            os.replace(tmp_path, path)
+
+            stat = os.stat(self.csv_path)
+            self._write_manifest({
+                'csv_path': self.csv_path,
+                'csv_size': stat.st_size,
+                'csv_mtime_ns': stat.st_mtime_ns,
+                'content_hash': content_hash,
+                'schema_version': SCHEMA_VERSION,
+                'snapshot': os.path.basename(path)
+            })
+
+            for name in os.listdir(self.cache_dir):
+                if name.startswith('admissions-') and name != os.path.basename(path):
+                    os.remove(os.path.join(self.cache_dir, name))
+        except Exception as e:
+            print(f"Snapshot write failed: {e}")
+
+
+def load_admissions(csv_path=DATA_PATH, cache_dir=SNAPSHOT_DIR, use_snapshot=True):
+    """Load the preprocessed admissions frame, from a snapshot when one is current
+
+    Rows are sorted by vdate. The CSV content hash is stored in
+    df.attrs['data_version'] so that indexes built on top of the frame can be
+    keyed by it.
+    """
+    cache = SnapshotCache(csv_path, cache_dir)
+    content_hash = cache.content_hash()
+
+    df = cache.load(content_hash) if use_snapshot else None
+    if df is None:
+        df = preprocess_admissions(read_admissions_csv(csv_path))
+        # Admissions are kept in vdate order so date ranges are contiguous slices
+        df = df.sort_values('vdate', kind='stable', na_position='last').reset_index(drop=True)
+        if use_snapshot:
+            cache.save(df, content_hash)
+
+    df.attrs['data_version'] = content_hash[:16]
+    return df
+
+
+def quantile_from_counts(values, counts, q):
+    """Exact linear-interpolation quantile (pandas' default) from value counts"""
+    order = np.argsort(values)
+    values = np.asarray(values, dtype=float)[order]
+    cumulative = np.cumsum(np.asarray(counts)[order])
+    position = (cumulative[-1] - 1) * q
+    lower = values[np.searchsorted(cumulative, np.floor(position), side='right')]
+    upper = values[np.searchsorted(cumulative, np.ceil(position), side='right')]
+    return float(lower + (upper - lower) * (position - np.floor(position)))
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch: exact value counts, compressed once they grow
+
+    While the sketch holds at most `capacity` distinct values it is an exact
+    value-count table and quantiles match pandas. LOS is a day count, so its
+    sketches stay exact at any row count. Past `capacity` the values are
+    merged into t-digest style centroids, small near the tails and larger in
+    the middle, and quantiles interpolate between centroid means.
+    """
+
+    def __init__(self, capacity=200):
+        self.capacity = capacity
+        self.means = np.zeros(0)
+        self.weights = np.zeros(0)
+        self.exact = True
+
+    @classmethod
+    def from_values(cls, values, capacity=200):
+        sketch = cls(capacity)
+        sketch.add(values)
+        return sketch
+
+    def add(self, values):
+        """Fold raw values into the sketch"""
+        values = pd.Series(values, dtype='float64').dropna()
+        counts = values.value_counts(sort=False)
+        self._absorb(counts.index.to_numpy(dtype=np.float64), counts.to_numpy(dtype=np.float64), True)
+        return self
+
+    def merge(self, other):
+        """Fold another sketch into this one"""
+        self._absorb(other.means, other.weights, other.exact)
+        return self
+
+    def _absorb(self, means, weights, exact):
+        means = np.concatenate([self.means, means])
+        weights = np.concatenate([self.weights, weights])
+        self.exact = self.exact and exact
+        if len(means) == 0:
+            return
+        # Sort and combine equal values so exact tables stay exact
+        order = np.argsort(means, kind='stable')
+        means, weights = means[order], weights[order]
+        starts = np.flatnonzero(np.r_[True, means[1:] != means[:-1]])
+        self.weights = np.add.reduceat(weights, starts)
+        self.means = means[starts]
+        if len(self.means) > self.capacity:
+            self._compress()
+
+    def _compress(self):
+        """Merge neighbouring values into centroids sized by the arcsine scale"""
+        total = self.weights.sum()
+        q_mid = (np.cumsum(self.weights) - self.weights / 2) / total
+        scale = self.capacity / (2 * np.pi)
+        cluster = np.floor(scale * np.arcsin(2 * q_mid - 1)).astype(np.int64)
+        starts = np.flatnonzero(np.r_[True, cluster[1:] != cluster[:-1]])
+        weights = np.add.reduceat(self.weights, starts)
+        self.means = np.add.reduceat(self.means * self.weights, starts) / weights
+        self.weights = weights
+        self.exact = False
+
+    def count(self):
+        return float(self.weights.sum())
+
+    def quantile(self, q):
+        """q-th quantile; exact (linear interpolation) while the sketch is exact"""
+        if len(self.means) == 0:
+            return float('nan')
+        if self.exact:
+            return quantile_from_counts(self.means, self.weights, q)
+        centers = np.cumsum(self.weights) - self.weights / 2
+        return float(np.interp(q * self.weights.sum(), centers, self.means))
+
+    def to_dict(self):
+        return {
+            'capacity': self.capacity,
+            'exact': self.exact,
+            'means': self.means.tolist(),
+            'weights': self.weights.tolist()
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data['capacity'])
+        sketch.means = np.array(data['means'], dtype=np.float64)
+        sketch.weights = np.array(data['weights'], dtype=np.float64)
+        sketch.exact = data['exact']
+        return sketch
+
+
+class AdmissionAggregates:
+    """Running totals behind the KPI cards and the department and trend charts
+
+    Updated one chunk at a time, so the dashboard summary can be produced
+    without holding every admission in memory. LOS quantile sketches are
+    kept per facid and per month and merged on demand.
+    """
+
+    MEASURES = ['count', 'los_sum', 'long_stay', 'readmit']
+    LOS_PERCENTILES = [0.5, 0.75, 0.9]
+
+    def __init__(self):
+        self.by_facid = pd.DataFrame(columns=self.MEASURES, dtype='float64')
+        self.by_month = pd.DataFrame(columns=self.MEASURES, dtype='float64')
+        self.los_by_facid = {}
+        self.los_by_month = {}
+
+    def update(self, chunk):
+        """Fold a preprocessed chunk into the running totals"""
+        measures = pd.DataFrame({
+            'facid': chunk['facid'].astype(str),
+            'month': chunk['month'].astype(str),
+            'count': 1,
+            'los_sum': chunk['lengthofstay'].astype('float64'),
+            'long_stay': (chunk['lengthofstay'] > 7).astype('int64'),
+            'readmit': chunk['readmit_flag'].astype('int64')
+        })
+        self.by_facid = self.by_facid.add(
+            measures.groupby('facid')[self.MEASURES].sum(), fill_value=0)
+        self.by_month = self.by_month.add(
+            measures.groupby('month')[self.MEASURES].sum(), fill_value=0)
+        for key, sketches in (('facid', self.los_by_facid), ('month', self.los_by_month)):
+            for value, los in measures.groupby(key)['los_sum']:
+                sketches.setdefault(value, QuantileSketch()).add(los)
+
+    def los_quantile(self, q, facids=None, months=None):
+        """LOS quantile over some departments or some months, from merged sketches"""
+        if facids is not None and months is not None:
+            raise ValueError("Sketches are kept per facid or per month, not both")
+        if months is not None:
+            parts = [self.los_by_month[m] for m in months if m in self.los_by_month]
+        else:
+            parts = [self.los_by_facid[f] for f in (facids if facids is not None else self.los_by_facid)
+                     if f in self.los_by_facid]
+        merged = QuantileSketch()
+        for sketch in parts:
+            merged.merge(sketch)
+        return merged.quantile(q)
+
+    def _months(self, months):
+        return self.by_month if months is None else self.by_month[self.by_month.index.isin(months)]
+
+    def kpis(self, months=None):
+        """Figures for create_kpi_cards(), over all months or the given month keys"""
+        totals = self._months(months).sum()
+        count = totals['count']
+        avg_los = totals['los_sum'] / count if count else float('nan')
+        kpis = {
+            'count': int(count),
+            'avg_los': float(avg_los),
+            'long_stay_rate': float(totals['long_stay'] / count * 100) if count else float('nan'),
+            'readmit_rate': float(totals['readmit'] / count * 100) if count else float('nan'),
+            'turnover': float(365 / avg_los) if count else float('nan')
+        }
+        for q in self.LOS_PERCENTILES:
+            kpis[f'los_p{int(q * 100)}'] = self.los_quantile(q, months=months) if count else float('nan')
+        return kpis
+
+    def dept_stats(self):
+        """Mean LOS and admission count per department"""
+        stats = pd.DataFrame({
+            'mean': self.by_facid['los_sum'] / self.by_facid['count'],
+            'count': self.by_facid['count'].astype('int64')
+        })
+        return stats.rename_axis('facid').reset_index()
+
+    def monthly_stats(self, months=None):
+        """Mean LOS and admission count per month, in create_trend_chart() layout"""
+        by_month = self._months(months)
+        stats = pd.DataFrame({
+            'lengthofstay': by_month['los_sum'] / by_month['count'],
+            'eid': by_month['count'].astype('int64')
+        })
+        return stats.sort_index().rename_axis('period').reset_index()
+
+    def to_dict(self):
+        return {
+            'by_facid': self.by_facid.to_dict(orient='index'),
+            'by_month': self.by_month.to_dict(orient='index'),
+            'los_by_facid': {k: s.to_dict() for k, s in self.los_by_facid.items()},
+            'los_by_month': {k: s.to_dict() for k, s in self.los_by_month.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregates = cls()
+        aggregates.by_facid = pd.DataFrame.from_dict(data['by_facid'], orient='index',
+                                                     columns=cls.MEASURES, dtype='float64')
+        aggregates.by_month = pd.DataFrame.from_dict(data['by_month'], orient='index',
+                                                     columns=cls.MEASURES, dtype='float64')
+        aggregates.los_by_facid = {k: QuantileSketch.from_dict(s)
+                                   for k, s in data.get('los_by_facid', {}).items()}
+        aggregates.los_by_month = {k: QuantileSketch.from_dict(s)
+                                   for k, s in data.get('los_by_month', {}).items()}
+        return aggregates
+
+
+class PartitionedStore:
+    """Admissions stored as one directory of Parquet files per vdate month
+
+    Layout is <root>/month=YYYY-MM/part-NNNNN.parquet, the same month key that
+    create_trend_analysis() groups on. A date-range read only opens the
+    partitions that overlap the range.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def partition_dir(self, month):
+        return os.path.join(self.root, f"month={month}")
+
+    def clear(self):
+        """Remove every partition under the root"""
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            if name.startswith('month='):
+                shutil.rmtree(os.path.join(self.root, name))
+
+    def write(self, df, part_name):
+        """Split a preprocessed frame by month and write one file per partition"""
+        for month, group in df.groupby(df['month'].astype(str)):
+            os.makedirs(self.partition_dir(month), exist_ok=True)
+            group.to_parquet(os.path.join(self.partition_dir(month), part_name), index=False)
+
+    def months(self):
+        """Sorted month keys present in the store"""
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name[len('month='):] for name in os.listdir(self.root)
+                      if name.startswith('month='))
+
+    def months_between(self, start_date=None, end_date=None):
+        """Partitions overlapping [start_date, end_date] - month keys sort as strings"""
+        lo = start_date.strftime('%Y-%m') if start_date else None
+        hi = end_date.strftime('%Y-%m') if end_date else None
+        return [m for m in self.months()
+                if (lo is None or m >= lo) and (hi is None or m <= hi)]
+
+    def read(self, start_date=None, end_date=None, columns=None):
+        """Load admissions with vdate in [start_date, end_date], pruning by month"""
+        frames = []
+        for month in self.months_between(start_date, end_date):
+            month_dir = self.partition_dir(month)
+            for name in sorted(os.listdir(month_dir)):
+                frames.append(pd.read_parquet(os.path.join(month_dir, name), columns=columns))
+        if not frames:
+            return pd.DataFrame(columns=columns)
+
+        df = pd.concat(frames, ignore_index=True)
+        if 'vdate' in df.columns:
+            if start_date:
+                df = df[df['vdate'] >= pd.Timestamp(start_date)]
+            if end_date:
+                df = df[df['vdate'] < pd.Timestamp(end_date) + pd.Timedelta(days=1)]
+            df = df.reset_index(drop=True)
+
+        # Each part file carries its own categories; re-unify them
+        return apply_compact_schema(df)
+
+
+def stream_admissions(csv_path, out_dir, chunksize=250_000):
+    """Preprocess a CSV that may not fit in memory into Parquet part files
+
+    Pass 1 reads only lengthofstay to get the file-wide LOS thresholds, so
+    every chunk derives is_long_stay and risk_level exactly as load_data()
+    would. Pass 2 preprocesses one chunk at a time, writes it out as its own
+    part file in each month partition it touches (see PartitionedStore) and
+    folds it into the running aggregates and bed census, which are saved to
+    aggregates.json at the store root.
+    """
+    if not PARQUET_AVAILABLE:
+        raise RuntimeError("pyarrow is required for streaming ingest")
+
+    # Pass 1: an LOS sketch is tiny, and exact (LOS is a day count)
+    los_sketch = QuantileSketch()
+    for chunk in pd.read_csv(csv_path, usecols=['lengthofstay'], chunksize=chunksize):
+        los_sketch.add(chunk['lengthofstay'])
+    thresholds = los_thresholds(los_sketch)
+
+    # Pass 2: derive, write and aggregate chunk by chunk
+    os.makedirs(out_dir, exist_ok=True)
+    store = PartitionedStore(out_dir)
+    store.clear()
+
+    aggregates = AdmissionAggregates()
+    census = BedCensus()
+    parts = []
+    rows = 0
+    for i, chunk in enumerate(read_admissions_csv(csv_path, chunksize=chunksize)):
+        chunk = preprocess_admissions(chunk, thresholds=thresholds)
+        aggregates.update(chunk)
+        census.update(chunk)
+
+        part = f"part-{i:05d}.parquet"
+        store.write(chunk, part)
+        parts.append(part)
+        rows += len(chunk)
+        print(f"Chunk {i}: {len(chunk)} rows -> {part}")
+
+    summary = {
+        'csv_path': csv_path,
+        'content_hash': csv_content_hash(csv_path),
+        'schema_version': SCHEMA_VERSION,
+        'rows': rows,
+        'thresholds': thresholds,
+        'parts': parts,
+        'months': store.months(),
+        'aggregates': aggregates.to_dict(),
+        'census': census.to_dict()
+    }
+    with open(os.path.join(out_dir, 'aggregates.json'), 'w') as f:
+        json.dump(summary, f, indent=2)
+
+    return aggregates
+
+
+def load_stream_summary(out_dir):
+    """aggregates.json of a streamed store with its aggregates and census rebuilt, else None"""
+    path = os.path.join(out_dir, 'aggregates.json')
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        summary = json.load(f)
+    if summary.get('schema_version') != SCHEMA_VERSION:
+        print(f"Ignoring {path}: written with schema {summary.get('schema_version')}, expected {SCHEMA_VERSION}")
+        return None
+    summary['aggregates'] = AdmissionAggregates.from_dict(summary['aggregates'])
+    summary['census'] = BedCensus.from_dict(summary['census']) if summary.get('census') else None
+    return summary
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Paper Search: FTS5 full-text index over paper_chunks with BM25 ranking
+"""
+
+import re
+import sqlite3
+
+PAPER_FTS_TABLE = 'paper_chunks_fts'
+
+# BM25 column weights: a query word in the title counts three times as much
+TITLE_WEIGHT = 3.0
+CHUNK_WEIGHT = 1.0
+
+# Words in nearly every chunk: their long posting lists cost time and add no ranking signal
+STOPWORDS = {'a', 'an', 'and', 'are', 'as', 'at', 'by', 'for', 'from', 'in', 'is',
+             'of', 'on', 'or', 'the', 'to', 'with'}
+
+
+def create_paper_fts(conn):
+    """Create the FTS5 index and the triggers that keep it in sync with paper_chunks
+
+    The index is external-content, so it stores postings only; the text is
+    read back from paper_chunks by rowid. Existing rows are (re)indexed.
+    """
+    conn.executescript(f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS {PAPER_FTS_TABLE} USING fts5(
+            title, chunk_text,
+            content='paper_chunks', content_rowid='id',
+            tokenize='porter unicode61'
+        );
+        CREATE TRIGGER IF NOT EXISTS paper_chunks_fts_insert AFTER INSERT ON paper_chunks BEGIN
+            INSERT INTO {PAPER_FTS_TABLE}(rowid, title, chunk_text)
+            VALUES (new.id, new.title, new.chunk_text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS paper_chunks_fts_delete AFTER DELETE ON paper_chunks BEGIN
+            INSERT INTO {PAPER_FTS_TABLE}({PAPER_FTS_TABLE}, rowid, title, chunk_text)
+            VALUES ('delete', old.id, old.title, old.chunk_text);
+        END;
+        CREATE TRIGGER IF NOT EXISTS paper_chunks_fts_update AFTER UPDATE OF title, chunk_text ON paper_chunks BEGIN
+            INSERT INTO {PAPER_FTS_TABLE}({PAPER_FTS_TABLE}, rowid, title, chunk_text)
+            VALUES ('delete', old.id, old.title, old.chunk_text);
+            INSERT INTO {PAPER_FTS_TABLE}(rowid, title, chunk_text)
+            VALUES (new.id, new.title, new.chunk_text);
+        END;
+        INSERT INTO {PAPER_FTS_TABLE}({PAPER_FTS_TABLE}) VALUES ('rebuild');
+    ''')
+    conn.commit()
+
+
+def ensure_paper_fts(db_path):
+    """Add the FTS5 index to a paper database that has paper_chunks; True if it exists afterwards"""
+    conn = sqlite3.connect(db_path)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        if 'paper_chunks' not in tables:
+            return False
+        if PAPER_FTS_TABLE not in tables:
+            create_paper_fts(conn)
+        return True
+    finally:
+        conn.close()
+
+
+def match_expression(query):
+    """FTS5 query matching any word of the free-text query (quoted, so never a syntax error)"""
+    words = dict.fromkeys(word for word in re.findall(r'\w+', query.lower()) if word not in STOPWORDS)
+    return ' OR '.join(f'"{word}"' for word in words)
+
+
+def search_paper_fts(cursor, query, top_k=3):
+    """Best top_k chunks by BM25 with title weighting; only matching postings are read"""
+    expression = match_expression(query)
+    if not expression:
+        return []
+    cursor.execute(f'''
+        SELECT c.filename, c.title, c.authors, c.year, c.chunk_text,
+               -bm25({PAPER_FTS_TABLE}, {TITLE_WEIGHT}, {CHUNK_WEIGHT}) AS score
+        FROM {PAPER_FTS_TABLE}
+        JOIN paper_chunks c ON c.id = {PAPER_FTS_TABLE}.rowid
+        WHERE {PAPER_FTS_TABLE} MATCH ?
+        ORDER BY bm25({PAPER_FTS_TABLE}, {TITLE_WEIGHT}, {CHUNK_WEIGHT})
+        LIMIT ?
+    ''', (expression, top_k))
+    return [{
+        'filename': filename,
+        'title': title,
+        'authors': authors,
+        'year': year,
+        'chunk_text': chunk_text,
+        'score': round(score, 3),
+        'ranking': 'bm25'
+    } for filename, title, authors, year, chunk_text, score in cursor.fetchall()]
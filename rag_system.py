@@ -6,16 +6,140 @@ RAG Retrieval System: Search relevant papers based on patient symptoms
 import os
 import sqlite3
 import json
+import atexit
+import threading
+import urllib.parse
+from contextlib import contextmanager
 import openai
 import numpy as np
 from sklearn.metrics.pairwise import cosine_similarity
 from dotenv import load_dotenv
 
+from summary_cache import SummaryCache, summary_key
+from paper_search import PAPER_FTS_TABLE, ensure_paper_fts, search_paper_fts
+
 # Load environment variables
 load_dotenv()
 
+
+class PaperDatabase:
+    """Pooled read-only connections to a paper database, shared by all threads
+
+    Connections open the file in read-only URI mode with memory-mapped reads
+    and go back to the pool after each query; at most pool_size stay open
+    while idle, so file handles stay flat however many sessions search. The
+    schema is detected once per version of the file (size and mtime), and
+    connections to a replaced file are not reused.
+    """
+
+    def __init__(self, path, pool_size=4, mmap_size=256 * 1024 * 1024):
+        self.path = path
+        self.pool_size = pool_size
+        self.mmap_size = mmap_size
+        self.lock = threading.Lock()
+        self.idle = []
+        self.version = None
+        self.schema = None
+
+    def _file_version(self):
+        stat = os.stat(self.path)
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def _connect(self):
+        uri = f"file:{urllib.parse.quote(os.path.abspath(self.path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, timeout=30)
+        conn.execute(f'PRAGMA mmap_size = {int(self.mmap_size)}')
+        conn.execute('PRAGMA query_only = 1')
+        return conn
+
+    def _refresh(self):
+        """Detect the schema if the file is new or was rebuilt; caller holds the lock"""
+        version = self._file_version()
+        if version == self.version:
+            return
+        self._close_idle()
+        conn = self._connect()
+        try:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        finally:
+            conn.close()
+        # 新的轻量数据库 (paper_chunks, 有全文索引时用 BM25) 优先于原有的向量数据库 (chunks)
+        if 'paper_chunks' in tables and PAPER_FTS_TABLE in tables:
+            self.schema = 'fts'
+        elif 'paper_chunks' in tables:
+            self.schema = 'lightweight'
+        elif 'chunks' in tables:
+            self.schema = 'vector'
+        else:
+            self.schema = None
+        self.version = version
+
+    def _close_idle(self):
+        for conn in self.idle:
+            conn.close()
+        self.idle = []
+
+    def open(self):
+        """Detect the schema up front; returns it ('fts', 'lightweight', 'vector' or None)"""
+        with self.lock:
+            self._refresh()
+            return self.schema
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection and the schema it serves for one query"""
+        with self.lock:
+            self._refresh()
+            version, schema = self.version, self.schema
+            conn = self.idle.pop() if self.idle else None
+        if conn is None:
+            conn = self._connect()
+        try:
+            yield conn, schema
+        finally:
+            with self.lock:
+                if version == self.version and len(self.idle) < self.pool_size:
+                    self.idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+
+    def close(self):
+        """Close idle connections; borrowed ones are closed when returned"""
+        with self.lock:
+            self._close_idle()
+            self.version = None
+            self.schema = None
+
+    def stats(self):
+        with self.lock:
+            return {'idle': len(self.idle), 'pool_size': self.pool_size, 'schema': self.schema}
+
+
+_paper_databases = {}
+_paper_databases_lock = threading.Lock()
+
+
+def paper_database(path):
+    """The process-wide PaperDatabase for a path, so every RAGSystem shares one pool"""
+    key = os.path.abspath(path)
+    with _paper_databases_lock:
+        if key not in _paper_databases:
+            _paper_databases[key] = PaperDatabase(path)
+        return _paper_databases[key]
+
+
+@atexit.register
+def close_paper_databases():
+    """Close every pooled paper database connection"""
+    with _paper_databases_lock:
+        databases = list(_paper_databases.values())
+    for database in databases:
+        database.close()
+
+
 class RAGSystem:
-    def __init__(self, db_path=None, api_key=None):
+    def __init__(self, db_path=None, api_key=None, summary_cache=None):
         # Auto-detect database path for different environments
         if db_path is None:
             possible_paths = [
@@ -34,6 +158,29 @@ class RAGSystem:
         # Use provided API key or fall back to environment variable
         self.api_key = api_key or os.getenv('OPENAI_API_KEY')
         self.client = None  # Initialize later when needed
+        self.chat_model = "gpt-3.5-turbo"
+
+        # Persistent cache of generated summaries, shared by every process
+        if summary_cache is None:
+            try:
+                summary_cache = SummaryCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"Summary cache unavailable: {e}")
+        self.summary_cache = summary_cache
+
+        # Pooled read-only connections; the schema is detected here, once
+        self.papers = paper_database(self.db_path) if self.db_path else None
+        if self.is_available():
+            try:
+                if self.papers.open() == 'lightweight':
+                    # One-off upgrade of an older database; searches fall back to a scan if it fails
+                    try:
+                        ensure_paper_fts(self.db_path)
+                        self.papers.open()
+                    except sqlite3.Error as e:
+                        print(f"Full-text index unavailable: {e}")
+            except sqlite3.Error as e:
+                print(f"Paper database unavailable: {e}")
         
         # Manual paper metadata mapping (fallback for papers without extractable metadata)
         self.paper_metadata_map = {
@@ -86,6 +233,18 @@ class RAGSystem:
             self.client = openai.OpenAI(api_key=self.api_key)
         return self.client
 
+    def corpus_version(self):
+        """Identifies the current paper database; changes whenever it is rebuilt"""
+        if not self.is_available():
+            return None
+        stat = os.stat(self.db_path)
+        return f"{stat.st_size}-{stat.st_mtime_ns}"
+
+    def close(self):
+        """Release pooled paper database connections (reopened on the next search)"""
+        if self.papers is not None:
+            self.papers.close()
+
     def get_embedding(self, text):
         """Get text embedding"""
         try:
@@ -279,22 +438,22 @@ class RAGSystem:
             if not self.is_available():
                 return []
 
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
-
-            # 检查数据库结构 - 支持新的轻量数据库
-            cursor.execute("SELECT name FROM sqlite_master WHERE type='table';")
-            tables = [row[0] for row in cursor.fetchall()]
-
-            if 'paper_chunks' in tables:
-                # 新的轻量数据库结构 - 基于关键词搜索
-                return self._search_lightweight_db(cursor, query, top_k)
-            elif 'chunks' in tables:
-                # 原有的向量数据库结构
-                return self._search_vector_db(cursor, query, top_k)
-            else:
-                conn.close()
-                return []
+            # 数据库结构在连接池中只检测一次
+            with self.papers.connection() as (conn, schema):
+                cursor = conn.cursor()
+                try:
+                    if schema == 'fts':
+                        # 轻量数据库的全文索引 - BM25 排序
+                        return search_paper_fts(cursor, query, top_k)
+                    elif schema == 'lightweight':
+                        # 新的轻量数据库结构 - 基于关键词搜索
+                        return self._search_lightweight_db(cursor, query, top_k)
+                    elif schema == 'vector':
+                        # 原有的向量数据库结构
+                        return self._search_vector_db(cursor, query, top_k)
+                    return []
+                finally:
+                    cursor.close()
 
         except Exception as e:
             print(f"Search error: {e}")
@@ -420,6 +579,18 @@ class RAGSystem:
         """Generate RAG-based response for patient"""
         # 提取患者症状和诊断依据
         symptoms, diagnostic_info = self.extract_symptoms_from_patient(patient_data)
+
+        # Same clinical inputs, question, model and corpus give the same summary
+        cache_key = None
+        if self.summary_cache is not None:
+            try:
+                cache_key = summary_key(patient_data, user_question, self.chat_model, self.corpus_version())
+                cached = self.summary_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            except (OSError, sqlite3.Error) as e:
+                print(f"Summary cache lookup failed: {e}")
+                cache_key = None
         
         # 构建搜索查询
         if user_question:
@@ -442,7 +613,12 @@ class RAGSystem:
         for paper in relevant_papers:
             # Handle both similarity (vector DB) and score (lightweight DB)
             paper_score = paper.get('similarity', paper.get('score', 0))
-            score_threshold = 0.65 if 'similarity' in paper else 3  # Lowered thresholds for broader matching
+            if 'similarity' in paper:
+                score_threshold = 0.65  # Lowered thresholds for broader matching
+            elif paper.get('ranking') == 'bm25':
+                score_threshold = 0  # Every full-text match; BM25 already ranked and limited them
+            else:
+                score_threshold = 3
 
             if paper_score >= score_threshold and paper['title'] not in seen_titles:
                 # 优先使用数据库中的元数据，如果没有再从文件名提取
@@ -510,7 +686,7 @@ Start directly with the clinical content without any introductory phrases or hea
                 raise Exception("No valid API key available")
 
             response = client.chat.completions.create(
-                model="gpt-3.5-turbo",
+                model=self.chat_model,
                 messages=[
                     {"role": "system", "content": "You are a medical assistant that answers questions based on provided literature content."},
                     {"role": "user", "content": prompt}
@@ -522,6 +698,13 @@ Start directly with the clinical content without any introductory phrases or hea
             
             ai_response = response.choices[0].message.content
 
+            if cache_key is not None and ai_response:
+                try:
+                    self.summary_cache.put(cache_key, ai_response, relevant_papers, diagnostic_info,
+                                           self.chat_model, self.corpus_version())
+                except (OSError, sqlite3.Error) as e:
+                    print(f"Summary cache write failed: {e}")
+
             # 不在这里添加引用，让app.py单独处理
             return ai_response, relevant_papers, diagnostic_info
             
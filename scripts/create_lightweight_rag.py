@@ -6,6 +6,11 @@ Create a lightweight RAG system for Streamlit Cloud deployment
 import sqlite3
 import json
 import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from paper_search import create_paper_fts
 
 def create_lightweight_db():
     """Create a lightweight database with just paper metadata and text chunks"""
@@ -99,6 +104,9 @@ def create_lightweight_db():
             None  # No embeddings for lightweight version
         ))
 
+    # Full-text index for BM25 search
+    create_paper_fts(conn)
+
     conn.commit()
     conn.close()
 
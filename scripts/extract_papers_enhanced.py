@@ -4,6 +4,7 @@
 """
 
 import os
+import sys
 import sqlite3
 import json
 import openai
@@ -17,6 +18,10 @@ from datetime import datetime
 # PDF处理相关
 import fitz  # PyMuPDF
 
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from paper_search import PAPER_FTS_TABLE, create_paper_fts
+
 # 加载环境变量
 load_dotenv()
 
@@ -32,7 +37,8 @@ class EnhancedPaperExtractor:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
 
-        # 删除旧表重新创建
+        # 删除旧表重新创建 (全文索引也一起重建)
+        cursor.execute(f"DROP TABLE IF EXISTS {PAPER_FTS_TABLE}")
         cursor.execute("DROP TABLE IF EXISTS paper_chunks")
 
         cursor.execute('''
@@ -50,6 +56,9 @@ class EnhancedPaperExtractor:
         )
         ''')
 
+        # 触发器让全文索引随 paper_chunks 的插入/更新/删除同步
+        create_paper_fts(conn)
+
         conn.commit()
         conn.close()
         print("数据库初始化完成")
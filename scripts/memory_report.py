@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+"""
+Compare memory usage of the admissions frame before and after the compact schema
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_pipeline import (DATA_PATH, read_admissions_csv, preprocess_admissions,
+                           memory_report)
+
+def main():
+    """Print a per-column memory report for the default and compact schemas"""
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else DATA_PATH
+    print(f"Loading {csv_path}...")
+
+    before = preprocess_admissions(read_admissions_csv(csv_path, compact=False), compact=False)
+    after = preprocess_admissions(read_admissions_csv(csv_path, compact=True), compact=True)
+
+    report = memory_report(before, after)
+    print(report.to_string(float_format=lambda x: f"{x:.1f}"))
+
+    total = report.loc['TOTAL']
+    print(f"\nTotal: {total['bytes_before'] / 1e6:.2f} MB -> {total['bytes_after'] / 1e6:.2f} MB "
+          f"({total['saved_pct']:.1f}% saved, {len(after)} rows)")
+
+    # Date columns are parsed once per unique value; report how that went
+    print("\nDate parsing:")
+    for col, col_report in after.attrs['date_report'].items():
+        print(f"  {col}: {col_report['unique_values']} unique values, "
+              f"{col_report['inferred_format']} in another format, {col_report['failed']} failed"
+              + (f", e.g. {col_report['failed_values'][:3]}" if col_report['failed'] else ""))
+
+if __name__ == "__main__":
+    main()
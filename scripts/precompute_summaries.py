@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Precompute clinical summaries for a patient cohort into the persistent summary cache
+"""
+
+import os
+import sys
+import time
+import zlib
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from types import SimpleNamespace
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_pipeline import load_admissions
+from clinical_rules import has_tier
+from rag_system import RAGSystem
+from summary_cache import SummaryCache, SUMMARY_CACHE_PATH, summary_key
+
+COHORTS = {
+    'high-risk': lambda df: df['risk_level'] == 'High Risk',
+    'critical': lambda df: has_tier(df, 'critical'),
+    'high-risk-or-critical': lambda df: (df['risk_level'] == 'High Risk') | has_tier(df, 'critical'),
+}
+
+
+class StubLLMClient:
+    """Stands in for openai.OpenAI so the job can run offline
+
+    Completions echo the symptom line of the prompt, embeddings are
+    deterministic per text, and fail_rate makes a share of calls raise to
+    exercise retries.
+    """
+
+    def __init__(self, latency=0.05, fail_rate=0.0, seed=0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.rng = np.random.default_rng(seed)
+        self.lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._complete))
+        self.embeddings = SimpleNamespace(create=self._embed)
+
+    def _maybe_fail(self):
+        time.sleep(self.latency)
+        with self.lock:
+            failed = self.rng.random() < self.fail_rate
+        if failed:
+            raise RuntimeError("stub LLM: simulated failure")
+
+    def _complete(self, model, messages, **kwargs):
+        self._maybe_fail()
+        prompt = messages[-1]['content']
+        symptoms = next((line for line in prompt.splitlines() if line.startswith('Patient symptom')), '')
+        content = f"[stub {model}] Clinical summary for {symptoms.split(':', 1)[-1].strip()}."
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+    def _embed(self, model, input):
+        self._maybe_fail()
+        rng = np.random.default_rng(zlib.crc32(input.encode('utf-8')))
+        return SimpleNamespace(data=[SimpleNamespace(embedding=rng.standard_normal(1536).tolist())])
+
+
+# Symptoms RAGSystem falls back to when nothing specific is found; the
+# detail page shows no summary for those patients
+GENERIC_SYMPTOMS = ['length of stay', 'hospital admission', 'medical care']
+
+
+def summarize(rag, patient, question, retries):
+    """Generate one summary, retrying failures with exponential backoff
+
+    Returns 'done', 'no evidence' (retrieval found no papers, nothing to
+    cache) or 'failed'.
+    """
+    for attempt in range(retries + 1):
+        try:
+            response, papers, _ = rag.get_rag_response_for_patient(patient, question)
+            if response and not response.startswith("❌"):
+                return 'done'
+            if response is None and not papers:
+                return 'no evidence'
+        except Exception as e:
+            print(f"Attempt {attempt + 1} failed for eid {patient.get('eid')}: {e}")
+        if attempt < retries:
+            time.sleep(0.5 * 2 ** attempt)
+    return 'failed'
+
+
+def question_or_conditions(rag, patient, question):
+    """Whether the app would ask for this summary: a chat question, or specific conditions"""
+    if question:
+        return True
+    symptoms, _ = rag.extract_symptoms_from_patient(patient)
+    return any(s not in GENERIC_SYMPTOMS for s in symptoms)
+
+
+def main():
+    """Select the cohort, skip fingerprints already cached and fill in the rest"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cohort', choices=sorted(COHORTS), default='high-risk-or-critical',
+                        help='which patients to precompute')
+    parser.add_argument('--question', default=None, help='user question to precompute (default: none)')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent summaries')
+    parser.add_argument('--limit', type=int, default=None, help='stop after this many summaries')
+    parser.add_argument('--retries', type=int, default=2, help='retries per summary')
+    parser.add_argument('--db-path', default=None, help='paper database (default: auto-detect)')
+    parser.add_argument('--cache-path', default=SUMMARY_CACHE_PATH, help='summary cache database')
+    parser.add_argument('--stub', action='store_true', help='use the offline stub LLM')
+    parser.add_argument('--stub-latency', type=float, default=0.05, help='stub seconds per call')
+    parser.add_argument('--stub-fail-rate', type=float, default=0.0, help='stub share of failing calls')
+    parser.add_argument('--report-every', type=int, default=25, help='progress line every N summaries')
+    args = parser.parse_args()
+
+    cache = SummaryCache(args.cache_path)
+    rag = RAGSystem(db_path=args.db_path, summary_cache=cache)
+    if not rag.is_available():
+        print("Paper database not found; nothing to precompute")
+        return 1
+    if args.stub:
+        rag.client = StubLLMClient(args.stub_latency, args.stub_fail_rate)
+    elif not rag.api_key:
+        print("OPENAI_API_KEY is not set (use --stub to run offline)")
+        return 1
+
+    df = load_admissions()
+    cohort = df[COHORTS[args.cohort](df)]
+
+    # Patients with the same clinical fingerprint share one summary; those
+    # already cached (e.g. by an interrupted earlier run) are skipped
+    corpus_version = rag.corpus_version()
+    pending = {}
+    seen = set()
+    cached = 0
+    for _, row in cohort.iterrows():
+        patient = row.to_dict()
+        if not question_or_conditions(rag, patient, args.question):
+            continue
+        key = summary_key(patient, args.question, rag.chat_model, corpus_version)
+        if key in seen:
+            continue
+        seen.add(key)
+        if cache.has(key):
+            cached += 1
+            continue
+        pending[key] = patient
+    jobs = list(pending.values())[:args.limit]
+
+    print(f"Cohort '{args.cohort}': {len(cohort)} admissions, {len(pending) + cached} distinct fingerprints, "
+          f"{cached} already cached, {len(jobs)} to generate with {args.workers} workers")
+
+    start = time.perf_counter()
+    done, no_evidence, failed = 0, 0, []
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        # At most two jobs per worker in flight, so huge cohorts are not queued up front
+        in_flight = {}
+        remaining = iter(jobs)
+        while True:
+            while len(in_flight) < 2 * args.workers:
+                patient = next(remaining, None)
+                if patient is None:
+                    break
+                in_flight[executor.submit(summarize, rag, patient, args.question, args.retries)] = patient
+            if not in_flight:
+                break
+
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                patient = in_flight.pop(future)
+                outcome = future.result()
+                if outcome == 'done':
+                    done += 1
+                elif outcome == 'no evidence':
+                    no_evidence += 1
+                else:
+                    failed.append(patient.get('eid'))
+                completed = done + no_evidence + len(failed)
+                if completed % args.report_every == 0:
+                    elapsed = time.perf_counter() - start
+                    rate = completed / elapsed if elapsed else 0.0
+                    eta = (len(jobs) - completed) / rate if rate else float('inf')
+                    print(f"{completed}/{len(jobs)} summaries ({len(failed)} failed) - "
+                          f"{rate:.1f}/s, ETA {eta:.0f}s")
+
+    elapsed = time.perf_counter() - start
+    rate = (done + no_evidence + len(failed)) / elapsed if elapsed else 0.0
+    print(f"\nGenerated {done}, no evidence {no_evidence}, failed {len(failed)}, "
+          f"skipped {cached} cached in {elapsed:.1f}s ({rate:.1f}/s)")
+    stats = cache.stats()
+    print(f"Cache: {stats['entries']} entries ({stats['nbytes'] / 2 ** 20:.1f} MB) at {args.cache_path}")
+    if failed:
+        print(f"Failed eids (rerun to resume): {failed[:20]}{' ...' if len(failed) > 20 else ''}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
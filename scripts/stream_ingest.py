@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+"""
+Stream a large admissions export into a month-partitioned Parquet store plus dashboard aggregates
+"""
+
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_pipeline import DATA_PATH, stream_admissions
+
+def main():
+    """Run the chunked ingest and print the resulting KPI summary"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('csv_path', nargs='?', default=DATA_PATH, help='admissions CSV export')
+    parser.add_argument('--out-dir', default='data/stream', help='root of the month-partitioned store')
+    parser.add_argument('--chunksize', type=int, default=250_000, help='rows per chunk')
+    args = parser.parse_args()
+
+    print(f"Streaming {args.csv_path} -> {args.out_dir} ({args.chunksize} rows per chunk)")
+    aggregates = stream_admissions(args.csv_path, args.out_dir, chunksize=args.chunksize)
+
+    kpis = aggregates.kpis()
+    print("\nKPI summary:")
+    print(f"  Average Length of Stay: {kpis['avg_los']:.1f} days")
+    print(f"  Extended Stay Rate: {kpis['long_stay_rate']:.1f}%")
+    print(f"  Readmission Rate: {kpis['readmit_rate']:.1f}%")
+    print(f"  Bed Turnover Rate: {kpis['turnover']:.1f}/year")
+
+if __name__ == "__main__":
+    main()
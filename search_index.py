@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Search Index: substring and fuzzy lookups over patient names and departments
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    from rapidfuzz.distance import OSA
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+def _codes(values, categories):
+    """Category codes of a column against an index's categories (-1 when absent)"""
+    if isinstance(values.dtype, pd.CategoricalDtype) and values.cat.categories.equals(categories):
+        return values.cat.codes.to_numpy()
+    return pd.Categorical(values, categories=categories).codes
+
+
+def edit_distance(a, b):
+    """Edit distance counting a swap of adjacent letters as one edit (optimal string alignment)
+
+    Pure Python fallback for rapidfuzz's OSA distance: 'jhon' is one edit from 'john'.
+    """
+    if RAPIDFUZZ_AVAILABLE:
+        return OSA.distance(a, b)
+    before, previous = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j - 2] and a[i - 2] == cb:
+                cost = min(cost, before[j - 2] + 1)
+            current.append(cost)
+        before, previous = previous, current
+    return previous[-1]
+
+
+class TrigramIndex:
+    """Trigram inverted index over the distinct lower-cased values of text columns
+
+    Postings hold value ids (categories), not rows, so the index stays small
+    when names repeat. A query of three or more characters intersects the
+    postings of its trigrams, shortest first, and only those candidates are
+    checked with a real substring test. Shorter queries check every distinct
+    value, which is still far fewer than the rows.
+    """
+
+    COLUMNS = ['full_name', 'facid']
+
+    def __init__(self, df, columns=None):
+        self.data_version = df.attrs.get('data_version')
+        self.columns = columns or self.COLUMNS
+        self.categories = {}
+        self.values = {}
+        self.postings = {}
+        for col in self.columns:
+            categories = df[col].astype('category').cat.categories
+            values = [str(v).lower() for v in categories]
+            grams = {}
+            for value_id, value in enumerate(values):
+                for gram in trigrams(value):
+                    grams.setdefault(gram, []).append(value_id)
+            self.categories[col] = categories
+            self.values[col] = values
+            self.postings[col] = {gram: np.array(ids, dtype=np.int32) for gram, ids in grams.items()}
+
+    def _candidates(self, col, query):
+        """Value ids that contain every trigram of the query"""
+        grams = trigrams(query)
+        if not grams:
+            return np.arange(len(self.values[col]), dtype=np.int32)
+        lists = sorted((self.postings[col].get(gram) for gram in grams),
+                       key=lambda ids: -1 if ids is None else len(ids))
+        if lists[0] is None:
+            return np.zeros(0, dtype=np.int32)
+        candidates = lists[0]
+        for ids in lists[1:]:
+            candidates = np.intersect1d(candidates, ids, assume_unique=True)
+            if len(candidates) == 0:
+                break
+        return candidates
+
+    def search(self, query, previous=None):
+        """Matching value ids per column for a case-insensitive substring query
+
+        previous is an earlier result; when this query contains its query,
+        only the values that matched before are re-checked.
+        """
+        query = query.lower()
+        matches = {}
+        for col in self.columns:
+            if previous is not None and previous['query'] in query:
+                candidates = previous['matches'][col]
+            else:
+                candidates = self._candidates(col, query)
+            values = self.values[col]
+            matches[col] = np.array([i for i in candidates if query in values[i]], dtype=np.int32)
+        return {'query': query, 'matches': matches}
+
+    def mask(self, result, df):
+        """Boolean mask of the frame's rows matching a search result in any column"""
+        hit = np.zeros(len(df), dtype=bool)
+        for col in self.columns:
+            flags = np.zeros(len(self.values[col]) + 1, dtype=bool)
+            flags[result['matches'][col]] = True
+            hit |= flags[_codes(df[col], self.categories[col])]  # code -1 (missing) hits the always-False last slot
+        return hit
+
+
+class FuzzyNameIndex:
+    """Misspelling-tolerant lookup over patient first and last names
+
+    Only the First_Name and Last_Name values are indexed, using the
+    TrigramIndex postings: far fewer distinct values than full names. A
+    query token is compared only with values of a close length that share
+    enough of its trigrams to be within the tolerance (each edit can
+    destroy at most four of them, a swap of adjacent letters included).
+    Those candidates are then verified with an OSA edit distance in C
+    (rapidfuzz), so transposed letters count as one typo. A two-word query
+    scores a full name as the sum of its first- and last-name distances.
+    """
+
+    COLUMNS = ['First_Name', 'Last_Name']
+    MAX_DISTANCE = 2
+
+    def __init__(self, df, columns=None):
+        self.data_version = df.attrs.get('data_version')
+        self.columns = columns or self.COLUMNS
+        self.trigrams = TrigramIndex(df, self.columns)
+        self.lengths = {col: np.array([len(v) for v in self.trigrams.values[col]], dtype=np.int32)
+                        for col in self.columns}
+
+    @classmethod
+    def default_distance(cls, token):
+        """Typos tolerated in a name: one up to four characters, else MAX_DISTANCE"""
+        return min(max((len(token) + 3) // 4, 1), cls.MAX_DISTANCE)
+
+    def _candidates(self, col, token, max_distance):
+        """Value ids of a close length sharing enough trigrams with the token"""
+        ids = np.flatnonzero(np.abs(self.lengths[col] - len(token)) <= max_distance)
+        grams = trigrams(token)
+        needed = len(grams) - 4 * max_distance
+        if needed <= 0:
+            return ids
+        postings = [self.trigrams.postings[col][gram] for gram in grams if gram in self.trigrams.postings[col]]
+        if not postings:
+            return np.zeros(0, dtype=np.int64)
+        shared = np.bincount(np.concatenate(postings), minlength=len(self.lengths[col]))
+        return ids[shared[ids] >= needed]
+
+    def _match(self, col, token, max_distance):
+        """Edit distance of every value within max_distance of the token, by value id"""
+        ids = self._candidates(col, token, max_distance)
+        values = self.trigrams.values[col]
+        if RAPIDFUZZ_AVAILABLE:
+            distances = [OSA.distance(token, values[i], score_cutoff=max_distance) for i in ids]
+        else:
+            distances = [edit_distance(token, values[i]) for i in ids]
+        distances = np.array(distances, dtype=np.int16)
+        keep = distances <= max_distance
+        return ids[keep], distances[keep]
+
+    def search(self, query):
+        """Name matches of the first and last query words
+
+        A single word is looked up in both columns. For two or more words
+        the first is a first name and the last a last name, in either order.
+        """
+        tokens = query.lower().split()
+        if len(tokens) > 1:
+            tokens = [tokens[0], tokens[-1]]
+        matches = [{col: self._match(col, token, self.default_distance(token)) for col in self.columns}
+                   for token in tokens]
+        return {'query': ' '.join(tokens),
+                'max_distance': sum(self.default_distance(token) for token in tokens),
+                'matches': matches}
+
+    def _row_distances(self, match, col, df):
+        """Distance per row of df for one token and column (a value above any tolerance if none)"""
+        ids, distances = match[col]
+        by_code = np.full(len(self.lengths[col]) + 1, 2 * self.MAX_DISTANCE + 1, dtype=np.int16)
+        by_code[ids] = distances
+        return by_code[_codes(df[col], self.trigrams.categories[col])]
+
+    def distances(self, result, df):
+        """Typos per row of the frame for a search result, -1 for no match"""
+        matches = result['matches']
+        if not matches:
+            return np.full(len(df), -1, dtype=np.int16)
+        first, last = self.columns
+        if len(matches) == 1:
+            best = np.minimum(self._row_distances(matches[0], first, df),
+                              self._row_distances(matches[0], last, df))
+        else:
+            in_order = self._row_distances(matches[0], first, df) + self._row_distances(matches[1], last, df)
+            swapped = self._row_distances(matches[0], last, df) + self._row_distances(matches[1], first, df)
+            best = np.minimum(in_order, swapped)
+        best[best > result['max_distance']] = -1
+        return best
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Summary Cache: clinical summaries persisted in SQLite, shared across processes
+"""
+
+import os
+import json
+import time
+import sqlite3
+import hashlib
+
+SUMMARY_CACHE_PATH = "data/cache/rag_summaries.db"
+
+# Bytes of stored text (response, papers and diagnostic JSON) of one row
+ENTRY_BYTES_SQL = ('length(CAST(response AS BLOB)) + length(CAST(papers AS BLOB)) + '
+                   'length(CAST(diagnostic_info AS BLOB))')
+
+# Patient fields read by RAGSystem.extract_symptoms_from_patient(); nothing
+# else about the patient reaches the prompt
+SYMPTOM_FIELDS = ['hematocrit', 'irondef', 'hemo', 'asthma', 'respiration', 'neutrophils',
+                  'pneum', 'depress', 'psychologicaldisordermajor', 'substancedependence',
+                  'sodium', 'dialysisrenalendstage', 'creatinine', 'bloodureanitro', 'diagnosis']
+
+
+def _plain(value):
+    """JSON-safe form of a patient field (numpy scalars, NaN, timestamps)"""
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    return str(value)
+
+
+def summary_key(patient_data, user_question, model, corpus_version):
+    """Fingerprint of everything that determines a clinical summary"""
+    fields = {field: _plain(patient_data.get(field)) for field in SYMPTOM_FIELDS}
+    payload = json.dumps({
+        'fields': fields,
+        'question': user_question or '',
+        'model': model,
+        'corpus': corpus_version
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    """Disk-backed cache of RAG responses with TTL and size eviction
+
+    One SQLite file in WAL mode, opened per call, so every thread and
+    every worker process on the host shares the same entries. Expired
+    entries are never returned; once the stored summaries and paper
+    excerpts take more than max_bytes, the least recently read ones are
+    dropped (SQLite reuses their pages, so the file stays about that size).
+    """
+
+    def __init__(self, path=SUMMARY_CACHE_PATH, ttl_seconds=7 * 24 * 3600, max_bytes=64 * 1024 * 1024):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._init_db()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute('PRAGMA busy_timeout = 30000')
+        return conn
+
+    def _init_db(self):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS summaries (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    papers TEXT NOT NULL,
+                    diagnostic_info TEXT NOT NULL,
+                    model TEXT,
+                    corpus_version TEXT,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS idx_summaries_last_access ON summaries (last_access)')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def get(self, key):
+        """(response, papers, diagnostic_info) for a live entry, else None"""
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                'SELECT response, papers, diagnostic_info FROM summaries WHERE key = ? AND created_at >= ?',
+                (key, now - self.ttl_seconds)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute('UPDATE summaries SET last_access = ? WHERE key = ?', (now, key))
+            conn.commit()
+        finally:
+            conn.close()
+        return row[0], json.loads(row[1]), json.loads(row[2])
+
+    def has(self, key):
+        """Whether a live entry exists, without counting as a read"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                'SELECT 1 FROM summaries WHERE key = ? AND created_at >= ?',
+                (key, time.time() - self.ttl_seconds)
+            ).fetchone()
+        finally:
+            conn.close()
+        return row is not None
+
+    def put(self, key, response, papers, diagnostic_info, model=None, corpus_version=None):
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                'INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, response, json.dumps(papers, default=_plain), json.dumps(diagnostic_info),
+                 model, corpus_version, now, now)
+            )
+            self._evict(conn, now)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def _evict(self, conn, now):
+        conn.execute('DELETE FROM summaries WHERE created_at < ?', (now - self.ttl_seconds,))
+        # Running total from the most recently read entry; the newest always stays
+        conn.execute(f'''
+            DELETE FROM summaries WHERE key IN (
+                SELECT key FROM (
+                    SELECT key,
+                           SUM({ENTRY_BYTES_SQL}) OVER (ORDER BY last_access DESC, key) AS total,
+                           ROW_NUMBER() OVER (ORDER BY last_access DESC, key) AS position
+                    FROM summaries
+                ) WHERE total > ? AND position > 1
+            )
+        ''', (self.max_bytes,))
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            conn.execute('DELETE FROM summaries')
+            conn.commit()
+        finally:
+            conn.close()
+
+    def stats(self):
+        conn = self._connect()
+        try:
+            count, nbytes = conn.execute(f'SELECT COUNT(*), COALESCE(SUM({ENTRY_BYTES_SQL}), 0) FROM summaries').fetchone()
+        finally:
+            conn.close()
+        return {'entries': count, 'nbytes': nbytes, 'max_bytes': self.max_bytes, 'ttl_seconds': self.ttl_seconds}
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Summary Jobs: clinical summaries generated on a background thread pool
+"""
+
+import copy
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class SummaryFailed(Exception):
+    """The LLM call behind a summary failed (API error, quota, rate limit, ...)"""
+
+    def __init__(self, response, papers, diagnostic_info):
+        super().__init__(response or "no summary generated")
+        self.response = response
+        self.papers = papers
+        self.diagnostic_info = diagnostic_info
+
+
+class SummaryJobs:
+    """Runs RAGSystem.get_rag_response_for_patient off the page-rendering thread
+
+    Jobs are keyed (e.g. by data version and eid) so reruns of the same page
+    attach to the running job instead of starting another one. Finished
+    results stay available until the oldest jobs are evicted.
+
+    A failed job is not started again before its retry time, which doubles
+    with every failure of the same key (retry_seconds up to max_retry_seconds),
+    unless the caller asks for a retry explicitly.
+    """
+
+    def __init__(self, rag_system, max_workers=2, max_jobs=256, retry_seconds=60, max_retry_seconds=900):
+        self.rag_system = rag_system
+        self.max_jobs = max_jobs
+        self.retry_seconds = retry_seconds
+        self.max_retry_seconds = max_retry_seconds
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='rag-summary')
+        self.jobs = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _generate(self, patient_data, user_question, api_key):
+        rag_system = self.rag_system
+        if api_key and api_key != rag_system.api_key:
+            # Shallow copy: same paper pool and summary cache, this session's key
+            rag_system = copy.copy(rag_system)
+            rag_system.update_api_key(api_key)
+        response, papers, diagnostic_info = rag_system.get_rag_response_for_patient(patient_data, user_question)
+        # LLM errors come back as a "❌ ..." response, or as None despite evidence
+        # and a key; no evidence or no key is a final answer, not a failure
+        if response is not None and response.startswith("❌"):
+            raise SummaryFailed(response, papers, diagnostic_info)
+        if response is None and papers and rag_system.api_key:
+            raise SummaryFailed(response, papers, diagnostic_info)
+        return response, papers, diagnostic_info
+
+    def _failed(self, job):
+        future = job['future']
+        return future.done() and future.exception() is not None
+
+    def _on_done(self, job, future):
+        with self.lock:
+            if future.exception() is not None:
+                job['failures'] += 1
+                delay = min(self.retry_seconds * 2 ** (job['failures'] - 1), self.max_retry_seconds)
+                job['retry_at'] = time.time() + delay
+            else:
+                job['failures'] = 0
+
+    def submit(self, key, patient_data, user_question=None, api_key=None, retry=False):
+        """Start a summary unless one for this key is running, finished or backing off
+
+        The key should say whether an API key is set, so entering one
+        starts a fresh job. retry=True restarts a failed job immediately.
+        """
+        with self.lock:
+            job = self.jobs.get(key)
+            if job is not None:
+                self.jobs.move_to_end(key)
+                if not self._failed(job) or not (retry or time.time() >= job['retry_at']):
+                    return job['future']
+            else:
+                job = {'future': None, 'failures': 0, 'retry_at': 0.0}
+
+            job['future'] = self.executor.submit(self._generate, dict(patient_data), user_question, api_key)
+            self.jobs[key] = job
+            while len(self.jobs) > self.max_jobs:
+                self.jobs.popitem(last=False)
+        job['future'].add_done_callback(lambda future: self._on_done(job, future))
+        return job['future']
+
+    def _future(self, key):
+        with self.lock:
+            job = self.jobs.get(key)
+            return None if job is None else job['future']
+
+    def status(self, key):
+        """'missing', 'running', 'failed' or 'done'"""
+        future = self._future(key)
+        if future is None:
+            return 'missing'
+        if not future.done():
+            return 'running'
+        return 'failed' if future.exception() is not None else 'done'
+
+    def result(self, key):
+        """(response, papers, diagnostic details) of a finished job, else None"""
+        future = self._future(key)
+        if future is None or not future.done() or future.exception() is not None:
+            return None
+        return future.result()
+
+    def error(self, key):
+        """Exception of a failed job (a SummaryFailed for an LLM error), else None"""
+        future = self._future(key)
+        if future is None or not future.done():
+            return None
+        return future.exception()
+
+    def retry_at(self, key):
+        """Time (epoch seconds) after which a failed job is started again by submit()"""
+        with self.lock:
+            job = self.jobs.get(key)
+            return None if job is None else job['retry_at']
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)